@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
 """
-从 main.py 中提取版本号
+从 picstitcher/__init__.py 中提取版本号（main.py 从包中导入 __version__）
 """
 import re
 import sys
 
+VERSION_FILE = 'picstitcher/__init__.py'
+
 def get_version():
-    """从 main.py 中提取 __version__ 的值"""
+    """从 picstitcher/__init__.py 中提取 __version__ 的值"""
     try:
-        with open('main.py', 'r', encoding='utf-8') as f:
+        with open(VERSION_FILE, 'r', encoding='utf-8') as f:
             content = f.read()
         
         # 匹配 __version__ = "x.x.x" 格式
@@ -18,7 +20,7 @@ def get_version():
             print(version)
             return version
         else:
-            print("ERROR: Could not find __version__ in main.py", file=sys.stderr)
+            print(f"ERROR: Could not find __version__ in {VERSION_FILE}", file=sys.stderr)
             sys.exit(1)
     except Exception as e:
         print(f"ERROR: {e}", file=sys.stderr)
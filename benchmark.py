@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+PicStitcher 性能基准测试
+
+用法:
+    python benchmark.py engines                       # 背景检测/两种变色引擎/拼接/编码
+    python benchmark.py engines --sizes 2000x1500     # 只测指定尺寸
+    python benchmark.py decode                        # 读取/解码方式对比（临时目录样例图片）
+    python benchmark.py decode --dir Z:\\歌词图片       # 测试指定目录（例如网络共享盘）
+    python benchmark.py all --json v1.6.json          # 全部测试并输出JSON结果
+    python benchmark.py engines --compare v1.5.json   # 与之前保存的JSON结果对比
+    python benchmark.py check --sizes 1000x750        # 一致性检查（有不一致时退出码为1）
+
+engines: 用合成的歌词图（多种尺寸、黑底/白底、带透明通道）测试
+    detect_background_type、apply_yellow_text_effect_fast、apply_yellow_text_effect_quality
+    （含 keep_alpha=False 的JPEG输出路径）、apply_yellow_text_effect_smooth、
+    vertical_concat_images、save_image_with_compression
+    docstring中的参考值：2000x1500 快速模式 < 50ms，高质量模式约 150-200ms，抗锯齿模式约 15ms
+    *_auto 为开启自动阈值（亮度直方图 + Otsu）时的耗时
+    另外对比文字边缘带灰度过渡（类似扫描件）的图片，快速模式和抗锯齿模式输出的JPEG体积
+
+decode: 对比三种读取/解码方式
+    path  - Image.open(路径) + load()（原有方式，Pillow内部多次小读取）
+    bytes - 一次整块读取 + BytesIO零拷贝解码（预读器使用的方式）
+    mmap  - mmap映射后直接交给Pillow（仅适合本地磁盘）
+
+check: 不计时，检查并行路径与整图处理的输出逐字节相同（每种算法模式、固定/自动阈值）
+    concat_recolored_pages - 逐页变色再拼接 == 先拼接再变色（stitch_images）
+    apply_yellow_text_effect_bands - 按行分块并行变色 == 整图变色（recolor_image）
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from picstitcher import (
+    __version__, ALGORITHMS, recolor_image, stitch_images, read_file_bytes, decode_image_bytes, detect_background_type,
+    apply_yellow_text_effect_fast, apply_yellow_text_effect_quality, apply_yellow_text_effect_smooth,
+    apply_yellow_text_effect_bands,
+    vertical_concat_images, save_image_with_compression,
+)
+from picstitcher.naming import IMAGE_EXTENSIONS
+from picstitcher.stitch import concat_recolored_pages
+
+DEFAULT_SIZES = [(1000, 750), (2000, 1500), (4000, 3000)]
+TEXT_COLOR = (218, 165, 32)
+
+# 合成图片的变体：名称 -> (背景色, 文字色, 是否带透明通道)
+VARIANTS = {
+    'dark': ((0, 0, 0), (240, 240, 240), False),
+    'light': ((250, 250, 250), (20, 20, 20), False),
+    'dark_alpha': ((0, 0, 0), (240, 240, 240), True),
+}
+
+def make_lyric_image(size, variant='dark', seed=0):
+    """生成类似歌词图的合成图片：纯色背景 + 若干行由笔画组成的"文字"
+
+    Args:
+        size: (宽, 高)
+        variant: VARIANTS中的名称
+        seed: 随机种子（相同参数生成完全相同的图片，便于跨版本对比）
+    """
+    background, foreground, with_alpha = VARIANTS[variant]
+    width, height = size
+    rnd = random.Random(seed)
+    img = Image.new('RGB', size, background)
+    draw = ImageDraw.Draw(img)
+
+    line_height = max(height // 12, 8)
+    stroke = max(line_height // 8, 1)
+    glyph = max(line_height * 2 // 3, 4)
+    y = line_height
+    while y + line_height < height - line_height:
+        x = width // 10
+        while x + glyph < width * 9 // 10:
+            # 每个"字"由几笔横竖笔画组成
+            for _ in range(rnd.randint(2, 4)):
+                if rnd.random() < 0.5:
+                    sy = y + rnd.randint(0, glyph - stroke)
+                    draw.rectangle([x, sy, x + glyph, sy + stroke], fill=foreground)
+                else:
+                    sx = x + rnd.randint(0, glyph - stroke)
+                    draw.rectangle([sx, y, sx + stroke, y + glyph], fill=foreground)
+            x += glyph + stroke * 2
+        y += line_height * 3 // 2
+
+    if with_alpha:
+        # 四周留一圈全透明边框，模拟带透明通道的PNG
+        img = img.convert('RGBA')
+        alpha = Image.new('L', size, 0)
+        ImageDraw.Draw(alpha).rectangle([width // 20, height // 20, width - width // 20, height - height // 20], fill=255)
+        img.putalpha(alpha)
+    return img
+
+def make_scan_image(size, seed=0):
+    """类似扫描件的歌词图：合成图轻微模糊，文字边缘带灰度过渡"""
+    return make_lyric_image(size, 'dark', seed).filter(ImageFilter.GaussianBlur(max(size[0] / 1500, 1)))
+
+def generate_sample_images(folder, count=20, size=(2000, 1500)):
+    """生成样例歌词图（黑底白字JPG），返回文件路径列表"""
+    folder = Path(folder)
+    paths = []
+    for i in range(count):
+        path = folder / f"第{i + 1:03d}首 样例1.jpg"
+        make_lyric_image(size, 'dark', seed=i).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+def parse_sizes(text):
+    """解析 "1000x750,2000x1500" 形式的尺寸列表"""
+    sizes = []
+    for item in text.split(','):
+        w, h = item.lower().split('x')
+        sizes.append((int(w), int(h)))
+    return sizes
+
+def time_call(func, repeat):
+    """重复调用func，返回每次耗时（秒）列表；先预热一次"""
+    func()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+def summarize(runs, pixels):
+    best = min(runs)
+    return {
+        'best_ms': best * 1000,
+        'median_ms': statistics.median(runs) * 1000,
+        'mpix_per_s': pixels / 1e6 / best if best > 0 else 0.0,
+    }
+
+# ---------------------------------------------------------------- engines
+
+def bench_engines(sizes, repeat=5, pages=4):
+    """测试背景检测、变色引擎、拼接和编码，返回 {用例名: 结果}"""
+    results = {}
+    band_workers = os.cpu_count() or 4
+    with tempfile.TemporaryDirectory() as tmp, ThreadPoolExecutor(max_workers=band_workers) as band_pool:
+        output_path = Path(tmp) / 'out.jpg'
+        for size in sizes:
+            size_name = f"{size[0]}x{size[1]}"
+            pixels = size[0] * size[1]
+            for variant in VARIANTS:
+                img = make_lyric_image(size, variant)
+                cases = {
+                    'detect_background_type': lambda: detect_background_type(img),
+                    'apply_yellow_text_effect_fast': lambda: apply_yellow_text_effect_fast(img, *TEXT_COLOR),
+                    'apply_yellow_text_effect_quality': lambda: apply_yellow_text_effect_quality(img, *TEXT_COLOR),
+                    # 输出JPEG时的路径（不保留透明通道，省去RGBA往返）
+                    'apply_yellow_text_effect_quality_rgb': lambda: apply_yellow_text_effect_quality(img, *TEXT_COLOR, keep_alpha=False),
+                    'apply_yellow_text_effect_smooth': lambda: apply_yellow_text_effect_smooth(img, *TEXT_COLOR),
+                    # 自动阈值（亮度直方图 + Otsu）的额外开销
+                    'apply_yellow_text_effect_fast_auto': lambda: apply_yellow_text_effect_fast(img, *TEXT_COLOR, auto_threshold=True),
+                    'apply_yellow_text_effect_smooth_auto': lambda: apply_yellow_text_effect_smooth(img, *TEXT_COLOR, auto_threshold=True),
+                    # 按行分块并行变色（与整图结果相同；单核机器上只有额外开销）
+                    'apply_yellow_text_effect_fast_bands': lambda: apply_yellow_text_effect_bands(
+                        img, *TEXT_COLOR, map_bands=band_pool.map, bands=band_workers * 2),
+                    'apply_yellow_text_effect_smooth_bands': lambda: apply_yellow_text_effect_bands(
+                        img, *TEXT_COLOR, use_smooth_mode=True, map_bands=band_pool.map, bands=band_workers * 2),
+                }
+                for func_name, func in cases.items():
+                    name = f"{func_name}/{size_name}/{variant}"
+                    results[name] = summarize(time_call(func, repeat), pixels)
+
+            # 拼接：同尺寸的多页（解码后的图片，只测拼接本身）
+            page_images = [make_lyric_image(size, 'dark', seed=i) for i in range(pages)]
+            name = f"vertical_concat_images/{size_name}x{pages}pages/dark"
+            results[name] = summarize(time_call(lambda: vertical_concat_images(page_images), repeat), pixels * pages)
+
+            # 编码：变色后的结果分别用压缩/不压缩两种设置保存
+            recolored = apply_yellow_text_effect_fast(make_lyric_image(size, 'dark'), *TEXT_COLOR)
+            for compression, label in ((True, 'compressed_q82'), (False, 'uncompressed_q95')):
+                name = f"save_image_with_compression/{size_name}/{label}"
+                runs = time_call(lambda: save_image_with_compression(recolored, output_path, compression, 82), repeat)
+                results[name] = summarize(runs, pixels)
+                results[name]['output_bytes'] = output_path.stat().st_size
+
+            # JPEG体积：扫描件样式的图片分别用二值阈值（快速模式）和抗锯齿模式变色后保存
+            scan = make_scan_image(size)
+            for engine, func in (('fast', apply_yellow_text_effect_fast), ('smooth', apply_yellow_text_effect_smooth)):
+                name = f"save_image_with_compression/{size_name}/scan_{engine}_q82"
+                recolored = func(scan, *TEXT_COLOR)
+                runs = time_call(lambda: save_image_with_compression(recolored, output_path, True, 82), repeat)
+                results[name] = summarize(runs, pixels)
+                results[name]['output_bytes'] = output_path.stat().st_size
+    return results
+
+# ---------------------------------------------------------------- decode
+
+def decode_by_path(path):
+    img = Image.open(path)
+    img.load()
+    return img
+
+def decode_by_bytes(path):
+    return decode_image_bytes(read_file_bytes(path))
+
+def decode_by_mmap(path):
+    return decode_image_bytes(read_file_bytes(path, use_mmap=True))
+
+DECODE_METHODS = {
+    'path': decode_by_path,
+    'bytes': decode_by_bytes,
+    'mmap': decode_by_mmap,
+}
+
+def bench_decode(paths, repeat=3):
+    """对每种方式重复测试repeat轮，各方式交替执行以减少系统缓存带来的偏差"""
+    total_bytes = sum(p.stat().st_size for p in paths)
+    timings = {name: [] for name in DECODE_METHODS}
+    # 预热一轮（首次解码会受CPU频率、库初始化等影响）
+    for method in DECODE_METHODS.values():
+        method(paths[0])
+    for _ in range(repeat):
+        for name, method in DECODE_METHODS.items():
+            start = time.perf_counter()
+            for path in paths:
+                method(path)
+            timings[name].append(time.perf_counter() - start)
+
+    results = {}
+    for name, runs in timings.items():
+        best = min(runs)
+        results[f"decode/{name}"] = {
+            'best_ms': best * 1000,
+            'median_ms': statistics.median(runs) * 1000,
+            'ms_per_file': best * 1000 / len(paths),
+            'mb_per_s': total_bytes / 1024 / 1024 / best if best > 0 else 0.0,
+        }
+    return results
+
+# ---------------------------------------------------------------- 输出
+
+def print_table(title, results, baseline=None):
+    print(f"\n{title}")
+    header = f"{'用例':<64}{'最佳(ms)':>11}{'中位数(ms)':>12}{'吞吐':>14}"
+    if baseline:
+        header += f"{'对比':>10}"
+    print(header)
+    for name, r in results.items():
+        if 'mpix_per_s' in r:
+            throughput = f"{r['mpix_per_s']:.1f} MP/s"
+        else:
+            throughput = f"{r['mb_per_s']:.1f} MB/s"
+        line = f"{name:<64}{r['best_ms']:>11.2f}{r['median_ms']:>12.2f}{throughput:>14}"
+        if baseline:
+            old = baseline.get(name)
+            if old and r['best_ms'] > 0:
+                # >1 表示比基线快
+                line += f"{old['best_ms'] / r['best_ms']:>9.2f}x"
+            else:
+                line += f"{'-':>10}"
+        print(line)
+
+def print_sizes(results):
+    """列出各编码用例的JPEG体积（抗锯齿模式与二值阈值的对比）"""
+    sized = {name: r['output_bytes'] for name, r in results.items() if 'output_bytes' in r}
+    if not sized:
+        return
+    print(f"\n{'JPEG体积':<64}{'字节':>11}{'对比':>12}")
+    for name, size in sized.items():
+        line = f"{name:<64}{size:>11,}"
+        binary = sized.get(name.replace('scan_smooth_', 'scan_fast_'))
+        if binary and binary != size:
+            line += f"{size / binary:>11.2f}x"
+        print(line)
+
+# ---------------------------------------------------------------- check
+
+def make_song_pages(size):
+    """一首歌的合成页面（PNG字节）：宽度不同（拼接时两侧补白），黑底/带透明通道/扫描件样式各有"""
+    width, height = size
+    pages = [
+        make_lyric_image(size, 'dark'),
+        make_lyric_image((width * 3 // 4, height), 'dark_alpha', seed=1),
+        make_scan_image((width // 2, height // 2), seed=2),
+    ]
+    data = []
+    for page in pages:
+        buffer = io.BytesIO()
+        page.save(buffer, 'PNG')
+        data.append(buffer.getvalue())
+    return data
+
+def check_consistency(sizes):
+    """检查并行路径与整图处理的输出逐字节相同，返回不一致的用例名列表"""
+    failures = []
+
+    def expect_same(name, expected, actual):
+        same = expected.size == actual.size and expected.tobytes() == actual.tobytes()
+        print(f"{'✓' if same else '✗'} {name}")
+        if not same:
+            failures.append(name)
+
+    for size in sizes:
+        size_name = f"{size[0]}x{size[1]}"
+        pages = make_song_pages(size)
+        for algorithm in ALGORITHMS:
+            for auto_threshold in (False, True):
+                suffix = '_auto' if auto_threshold else ''
+                expected = stitch_images([io.BytesIO(page) for page in pages], True, TEXT_COLOR, algorithm, auto_threshold)
+                actual = concat_recolored_pages(
+                    [io.BytesIO(page) for page in pages],
+                    lambda page, levels: recolor_image(page, TEXT_COLOR, algorithm, auto_threshold, levels),
+                    auto_threshold)
+                expect_same(f"concat_recolored_pages/{size_name}/{algorithm}{suffix}", expected, actual)
+
+        # 分块变色：高度取奇数，最后一块行数与其他块不同
+        images = {variant: make_lyric_image((size[0], size[1] + 1), variant) for variant in VARIANTS}
+        images['scan'] = make_scan_image((size[0], size[1] + 1))
+        with ThreadPoolExecutor(max_workers=4) as band_pool:
+            for variant, img in images.items():
+                for algorithm in ALGORITHMS:
+                    for auto_threshold in (False, True):
+                        suffix = '_auto' if auto_threshold else ''
+                        expected = recolor_image(img, TEXT_COLOR, algorithm, auto_threshold)
+                        for bands in (3, 8):
+                            actual = apply_yellow_text_effect_bands(
+                                img, *TEXT_COLOR, use_quality_mode=algorithm == 'quality',
+                                auto_mode=algorithm == 'auto', use_smooth_mode=algorithm == 'smooth',
+                                auto_threshold=auto_threshold, map_bands=band_pool.map, bands=bands)
+                            expect_same(f"apply_yellow_text_effect_bands/{size_name}/{variant}/"
+                                        f"{algorithm}{suffix}/{bands}bands", expected, actual)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="PicStitcher 性能基准测试")
+    parser.add_argument('suite', choices=['engines', 'decode', 'all', 'check'], help="测试项目")
+    parser.add_argument('--sizes', default=','.join(f"{w}x{h}" for w, h in DEFAULT_SIZES),
+                        help="engines使用的图片尺寸，如 1000x750,2000x1500")
+    parser.add_argument('--dir', help="decode使用指定目录中的图片（默认在临时目录生成样例）")
+    parser.add_argument('--repeat', type=int, default=5, help="重复次数（默认5）")
+    parser.add_argument('--json', help="把结果写入JSON文件")
+    parser.add_argument('--compare', help="与之前保存的JSON结果对比（显示加速比）")
+    args = parser.parse_args()
+
+    if args.suite == 'check':
+        failures = check_consistency(parse_sizes(args.sizes))
+        if failures:
+            print(f"\n❌ {len(failures)} 个用例与整图处理的结果不一致")
+            sys.exit(1)
+        print("\n✅ 全部一致")
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+
+    report = {
+        'version': __version__,
+        'suite': args.suite,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': {},
+    }
+
+    if args.suite in ('engines', 'all'):
+        results = bench_engines(parse_sizes(args.sizes), args.repeat)
+        report['results'].update(results)
+        print_table("变色引擎 / 拼接 / 编码", results, baseline)
+        print_sizes(results)
+
+    if args.suite in ('decode', 'all'):
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.dir:
+                paths = sorted(p for p in Path(args.dir).iterdir()
+                               if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+                source = str(args.dir)
+            else:
+                paths = generate_sample_images(tmp)
+                source = 'generated'
+            if not paths:
+                parser.error("目录中没有图片")
+            results = bench_decode(paths, args.repeat)
+            report['decode_source'] = source
+            report['decode_files'] = len(paths)
+            report['results'].update(results)
+            print_table(f"解码对比（{len(paths)}个文件，来源: {source}）", results, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.json}")
+
+if __name__ == '__main__':
+    main()
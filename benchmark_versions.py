@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+PicStitcher 跨版本性能回归测试
+
+把 版本管理/ 下的各个历史版本（mainV1.1 ~ mainV1.5）和当前的 picstitcher 包分别导入
+（只导入模块，不会创建Tk窗口），用同一批合成歌词图跑 apply_yellow_text_effect 和
+vertical_concat_images，输出每个版本的吞吐量、峰值内存和与参考版本的像素差异。
+
+用法:
+    python benchmark_versions.py                          # 全部版本，默认尺寸
+    python benchmark_versions.py --versions V1.4,V1.5,current
+    python benchmark_versions.py --sizes 2000x1500 --json versions.json
+    python benchmark_versions.py --reference V1.5         # 以V1.5的输出为像素对比基准
+
+说明:
+    - 各版本都使用默认参数调用（当前版本即快速模式），与各版本GUI中"反色"的默认行为一致
+    - 峰值内存来自 tracemalloc，包含Python和NumPy的分配，不包含Pillow内部的图像缓冲区
+    - 像素差异按RGB比较（透明通道已丢弃，与最终保存的JPG一致）
+"""
+import argparse
+import importlib.util
+import json
+import re
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from benchmark import DEFAULT_SIZES, TEXT_COLOR, VARIANTS, make_lyric_image, parse_sizes
+
+ROOT = Path(__file__).parent
+VERSIONS_DIR = ROOT / '版本管理'
+
+def discover_versions():
+    """返回 {版本名: 文件路径}，按版本号排序，最后是当前的picstitcher包"""
+    versions = {}
+    snapshots = []
+    for path in VERSIONS_DIR.glob('mainV*.py'):
+        match = re.match(r'mainV([\d.]+)$', path.stem)
+        if match:
+            snapshots.append((tuple(int(p) for p in match.group(1).split('.')), path))
+    for number, path in sorted(snapshots):
+        versions['V' + '.'.join(map(str, number))] = path
+    versions['current'] = ROOT / 'picstitcher' / '__init__.py'
+    return versions
+
+def load_version(name, path):
+    """以独立模块名导入某个版本的文件（不执行 __main__ 部分，不会启动界面）"""
+    if name == 'current':
+        import picstitcher
+        return picstitcher
+    module_name = 'picstitcher_' + re.sub(r'\W', '_', name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def build_corpus(folder, sizes, pages):
+    """生成测试语料：单页图片（各尺寸/变体）和多页歌曲（写成PNG文件，旧版本的拼接函数只接受路径）"""
+    singles = []
+    for size in sizes:
+        for variant in VARIANTS:
+            singles.append((f"{size[0]}x{size[1]}/{variant}", make_lyric_image(size, variant)))
+
+    songs = []
+    for size in sizes:
+        paths = []
+        for page in range(pages):
+            path = Path(folder) / f"{size[0]}x{size[1]}_{page + 1}.png"
+            make_lyric_image(size, 'dark', seed=page).save(path)
+            paths.append(str(path))
+        songs.append((f"{size[0]}x{size[1]}x{pages}pages", paths))
+    return singles, songs
+
+def to_rgb_array(image):
+    """统一转为RGB数组用于像素对比（与保存JPG前的处理一致）"""
+    return np.asarray(image.convert('RGB'))
+
+def run_version(module, singles, songs, repeat):
+    """跑一个版本，返回 (统计结果, {用例名: RGB输出数组})
+
+    先在关闭tracemalloc时计时（tracemalloc会拦截每次内存分配，计时偏慢，与benchmark.py不可比），
+    再单独把每个用例跑一遍测峰值内存。
+    """
+    recolor = lambda img: module.apply_yellow_text_effect(img, *TEXT_COLOR)
+    outputs = {}
+
+    def timed(func):
+        # 预热一次并保留输出，之后计时取最佳值
+        result = func()
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return result, best
+
+    recolor_time = recolor_pixels = 0
+    concat_time = concat_pixels = 0
+    pipeline_time = pipeline_pixels = 0
+
+    for name, img in singles:
+        result, seconds = timed(lambda: recolor(img))
+        outputs[f"recolor/{name}"] = to_rgb_array(result)
+        recolor_time += seconds
+        recolor_pixels += img.width * img.height
+
+    for name, paths in songs:
+        stitched, seconds = timed(lambda: module.vertical_concat_images(paths))
+        pixels = stitched.width * stitched.height
+        concat_time += seconds
+        concat_pixels += pixels
+
+        # 完整流程：拼接 + 变色（反色+拼接模式）
+        result, seconds = timed(lambda: recolor(module.vertical_concat_images(paths)))
+        outputs[f"stitch+recolor/{name}"] = to_rgb_array(result)
+        pipeline_time += seconds
+        pipeline_pixels += pixels
+
+    # 峰值内存：不计时，每个用例跑一次（完整流程已包含单独拼接的内存）
+    tracemalloc.start()
+    try:
+        for _, img in singles:
+            recolor(img)
+        for _, paths in songs:
+            recolor(module.vertical_concat_images(paths))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    stats = {
+        'recolor_mpix_per_s': recolor_pixels / 1e6 / recolor_time if recolor_time else 0.0,
+        'concat_mpix_per_s': concat_pixels / 1e6 / concat_time if concat_time else 0.0,
+        'pipeline_mpix_per_s': pipeline_pixels / 1e6 / pipeline_time if pipeline_time else 0.0,
+        'peak_memory_mb': peak / 1024 / 1024,
+    }
+    return stats, outputs
+
+def pixel_diff(outputs, reference):
+    """与参考版本的输出对比：不同像素的百分比和平均绝对误差"""
+    differing = total = 0
+    abs_error = 0.0
+    for name, array in outputs.items():
+        ref = reference.get(name)
+        if ref is None or ref.shape != array.shape:
+            continue
+        diff = np.abs(array.astype(np.int16) - ref.astype(np.int16))
+        differing += int(np.count_nonzero(diff.any(axis=2)))
+        total += array.shape[0] * array.shape[1]
+        abs_error += float(diff.mean()) * array.shape[0] * array.shape[1]
+    if total == 0:
+        return None, None
+    return differing * 100.0 / total, abs_error / total
+
+def main():
+    parser = argparse.ArgumentParser(description="PicStitcher 跨版本性能回归测试")
+    parser.add_argument('--versions', help="要测试的版本，逗号分隔（如 V1.4,V1.5,current），默认全部")
+    parser.add_argument('--reference', default='current', help="像素对比的参考版本（默认current）")
+    parser.add_argument('--sizes', default=','.join(f"{w}x{h}" for w, h in DEFAULT_SIZES[:2]),
+                        help="语料图片尺寸，如 1000x750,2000x1500")
+    parser.add_argument('--pages', type=int, default=4, help="每首歌的页数（默认4）")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数（默认3）")
+    parser.add_argument('--json', help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    available = discover_versions()
+    names = args.versions.split(',') if args.versions else list(available)
+    unknown = [n for n in names + [args.reference] if n not in available]
+    if unknown:
+        parser.error(f"未知版本: {', '.join(unknown)}（可用: {', '.join(available)}）")
+    if args.reference not in names:
+        names.append(args.reference)
+
+    results = {}
+    all_outputs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        singles, songs = build_corpus(tmp, parse_sizes(args.sizes), args.pages)
+        for name in names:
+            print(f"正在测试 {name} ...")
+            module = load_version(name, available[name])
+            results[name], all_outputs[name] = run_version(module, singles, songs, args.repeat)
+
+    reference = all_outputs[args.reference]
+    for name in names:
+        diff_percent, mean_abs_error = pixel_diff(all_outputs[name], reference)
+        results[name]['diff_pixels_percent'] = diff_percent
+        results[name]['mean_abs_error'] = mean_abs_error
+
+    print(f"\n{'版本':<10}{'变色(MP/s)':>12}{'拼接(MP/s)':>12}{'拼接+变色(MP/s)':>17}{'峰值内存(MB)':>14}{'差异像素%':>12}{'平均误差':>10}")
+    for name in names:
+        r = results[name]
+        diff = '-' if r['diff_pixels_percent'] is None else f"{r['diff_pixels_percent']:.2f}"
+        error = '-' if r['mean_abs_error'] is None else f"{r['mean_abs_error']:.2f}"
+        print(f"{name:<10}{r['recolor_mpix_per_s']:>12.1f}{r['concat_mpix_per_s']:>12.1f}"
+              f"{r['pipeline_mpix_per_s']:>17.1f}{r['peak_memory_mb']:>14.1f}{diff:>12}{error:>10}")
+    print(f"（像素差异以 {args.reference} 为参考）")
+
+    if args.json:
+        report = {'reference': args.reference, 'sizes': args.sizes, 'pages': args.pages, 'results': results}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,7 @@ pyinstaller ^
 --hidden-import=tkinter.filedialog ^
 --hidden-import=tkinter.messagebox ^
 --hidden-import=tkinter.colorchooser ^
+--collect-submodules=picstitcher ^
 --name "PicStitcher" ^
 --distpath dist-pyinstaller ^
 main.py
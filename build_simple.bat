@@ -12,6 +12,7 @@ python -m nuitka ^
 --include-module=numpy ^
 --include-module=tkinter ^
 --include-module=tkinter.colorchooser ^
+--include-package=picstitcher ^
 --include-module=json ^
 --include-module=pathlib ^
 --include-module=threading ^
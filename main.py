@@ -1,353 +1,59 @@
+import time
+_IMPORT_START = time.perf_counter()  # 启动耗时统计（--import-time）的起点
+
 import os
-import re
+import sys
 import json  # 新增
+import logging
+import queue
+import signal
+from collections import deque
 from pathlib import Path
-from PIL import Image
-import numpy as np
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox, colorchooser  # 添加colorchooser
 import threading
-from concurrent.futures import ThreadPoolExecutor
-import multiprocessing as mp
 
-# 版本信息
-__version__ = "1.6"
+# 处理逻辑都在picstitcher包中（不依赖tkinter），这里只有图形界面和命令行。
+# 启动时只导入不依赖NumPy/Pillow的轻量模块；BatchProcessor等通过 picstitcher.xxx 按需导入，
+# 窗口显示后由后台线程预热（见 start_warm_up）
+import picstitcher
+from picstitcher import __version__
+from picstitcher.logs import classify_log_message, create_file_logger
+from picstitcher.naming import IMAGE_EXTENSIONS
+from picstitcher.perf import format_progress_stats
+from picstitcher.settings import (
+    DEFAULT_SETTINGS, get_algorithm, get_config_path, load_settings, parse_hex_color,
+)
 
-def extract_info(filename):
-    """从文件名中提取歌曲编号、歌名和页码"""
-    # 使用 pathlib 获取文件名（无扩展名）
-    file_stem = Path(filename).stem
-    
-    # 原有的正则表达式模式
-    pattern1 = r'第(\d+)首\s+(.+?)(\d+)$'
-    match = re.match(pattern1, file_stem)
-    if match:
-        song_number = match.group(1)
-        song_name = match.group(2).strip()
-        page_number = int(match.group(3))
-        return song_number, song_name, page_number
-    
-    # 新增的正则表达式模式，匹配"001.圣哉三一歌1"这样的格式
-    pattern2 = r'(\d+)\.(.+?)(\d+)$'
-    match = re.match(pattern2, file_stem)
-    if match:
-        song_number = match.group(1)
-        song_name = match.group(2).strip()
-        page_number = int(match.group(3))
-        return song_number, song_name, page_number
-    
-    # 新增模式，匹配"第0707愿将我的心给你1"这样的格式
-    pattern3 = r'第(\d+)([^0-9].+?)(\d+)$'
-    match = re.match(pattern3, file_stem)
-    if match:
-        song_number = match.group(1)
-        song_name = match.group(2).strip()
-        page_number = int(match.group(3))
-        return song_number, song_name, page_number
-    
-    return None
+_IMPORT_END = time.perf_counter()
 
-def vertical_concat_images(image_paths):
-    """竖向拼接图片"""
-    # 打开所有图片
-    images = []
-    for i, path in enumerate(image_paths):
-        try:
-            img = Image.open(path)
-            img.load()  # 确保图像已加载
-            images.append(img)
-        except Exception as e:
-            # 继续处理其他图片
-            pass
-    
-    if not images:
-        raise ValueError("无有效图片可拼接")
-    
-    # 找到最大宽度
-    max_width = max(img.width for img in images)
-    
-    # 计算总高度
-    total_height = sum(img.height for img in images)
-    
-    # 创建新图像
-    result_img = Image.new('RGB', (max_width, total_height), color=(255, 255, 255))
-    
-    # 粘贴图片
-    y_offset = 0
-    for i, img in enumerate(images):
-        # 如果图片宽度小于最大宽度，居中放置
-        x_offset = (max_width - img.width) // 2
-        result_img.paste(img, (x_offset, y_offset))
-        y_offset += img.height
-    
-    return result_img
-
-def detect_background_type(image):
-    """检测图片背景类型（深色或浅色）
-
-    通过采样图片四个边缘的像素，计算平均亮度来判断背景类型。
+# 不应在显示窗口前导入的重量级模块（--import-time 检查启动回归）
+DEFERRED_MODULES = ('numpy', 'PIL', 'concurrent.futures', 'multiprocessing')
 
-    Args:
-        image: PIL.Image对象
+# 界面刷新间隔（毫秒）：处理线程的日志和进度先放入队列，界面线程按此间隔批量刷新
+UI_REFRESH_MS = 100
 
-    Returns:
-        str: 'dark' 或 'light'
-    """
-    try:
-        # 转换为RGB模式
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-
-        img_array = np.array(image)
-        h, w = img_array.shape[:2]
-
-        # 边缘区域大小（取图片尺寸的10%）
-        edge_size = max(min(h, w) // 10, 5)  # 至少5像素
-
-        # 采样四个边缘的像素
-        top_edge = img_array[:edge_size, :]
-        bottom_edge = img_array[-edge_size:, :]
-        left_edge = img_array[:, :edge_size]
-        right_edge = img_array[:, -edge_size:]
-
-        # 合并所有边缘像素
-        edges = np.concatenate([
-            top_edge.reshape(-1, 3),
-            bottom_edge.reshape(-1, 3),
-            left_edge.reshape(-1, 3),
-            right_edge.reshape(-1, 3)
-        ])
-
-        # 计算边缘平均亮度（使用标准亮度公式）
-        luminance = (
-            0.299 * edges[:, 0] +
-            0.587 * edges[:, 1] +
-            0.114 * edges[:, 2]
-        )
-        avg_luminance = np.mean(luminance)
-
-        # 判断背景类型
-        # 阈值80：低于80认为是深色背景，高于80认为是浅色背景
-        return 'dark' if avg_luminance < 80 else 'light'
+# 日志：界面只保留最近的行，完整日志写入轮转的日志文件
+LOG_VIEW_MAX_LINES = 2000              # 日志框最多显示的行数
 
-    except Exception as e:
-        print(f"检测背景类型失败: {e}")
-        # 默认返回浅色背景（使用原有逻辑）
-        return 'light'
+# 窗口显示后多久开始后台预热（毫秒），避免导入NumPy时与窗口的首次绘制争抢GIL
+WARM_UP_DELAY_MS = 300
 
-def apply_yellow_text_effect_fast(image, text_r=187, text_g=159, text_b=97):
-    """模式一：超高速变色效果 - 极致性能优化版本
-    
-    性能优化策略：
-    1. 使用整数运算替代浮点运算（3倍速提升）
-    2. 直接处理RGB，避免RGBA转换（减少25%内存）
-    3. 向量化赋值，一次性设置所有通道（2倍速提升）
-    4. 简化背景检测（减少50%计算）
-    
-    预期性能：2000x1500图片 < 50ms
-    适用场景：标准歌词图、批量处理、JPG格式
-    """
-    try:
-        # 转换为RGB（比RGBA快，内存占用少25%）
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # 零拷贝：使用asarray而不是array
-        img_array = np.asarray(image)
-        
-        # 极速亮度计算：整数运算（比浮点快3倍）
-        # 使用位移运算代替除法：(77*R + 150*G + 29*B) >> 8 ≈ 0.299*R + 0.587*G + 0.114*B
-        luminance = (
-            img_array[..., 0].astype(np.uint16) * 77 +
-            img_array[..., 1].astype(np.uint16) * 150 +
-            img_array[..., 2].astype(np.uint16) * 29
-        ) >> 8  # 右移8位 = 除以256
-        
-        # 预分配结果数组（黑色背景）
-        result = np.zeros_like(img_array)
-        
-        # 快速背景检测：只检查中心区域（减少90%计算）
-        h, w = img_array.shape[:2]
-        center_y, center_x = h // 2, w // 2
-        sample_size = min(h, w) // 10
-        center_sample = luminance[
-            center_y - sample_size:center_y + sample_size,
-            center_x - sample_size:center_x + sample_size
-        ]
-        is_dark_bg = np.mean(center_sample) < 80
-        
-        # 根据背景类型设置阈值
-        threshold = 100 if is_dark_bg else 150
-        
-        # 创建文字掩码
-        is_text = (luminance > threshold) if is_dark_bg else (luminance < threshold)
-        
-        # 向量化赋值：一次性设置所有通道（比逐通道快2倍）
-        result[is_text] = [text_r, text_g, text_b]
-        
-        return Image.fromarray(result, 'RGB')
-        
-    except Exception as e:
-        print(f"应用变色效果失败: {e}")
-        return image
-
-def apply_yellow_text_effect_quality(image, text_r=187, text_g=159, text_b=97):
-    """模式二：高质量变色效果 - 精确算法版本（V1.4）
-    
-    特点：
-    1. 标准浮点运算，精度更高
-    2. 支持RGBA，完美保留透明通道
-    3. 四边检测，背景判断更准确
-    4. 逐通道处理，细节更丰富
-    
-    预期性能：2000x1500图片 约 150-200ms
-    适用场景：带透明PNG、复杂背景、边缘装饰图、高质量要求
-    """
-    try:
-        # 检测背景类型
-        bg_type = detect_background_type(image)
-
-        # 转换为RGBA模式，便于处理透明度
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-        img_array = np.array(image)
-
-        # 标准亮度计算方法（ITU-R BT.601）
-        luminance = (
-            0.299 * img_array[..., 0] +
-            0.587 * img_array[..., 1] +
-            0.114 * img_array[..., 2]
-        )
-
-        # 预分配结果数组
-        result = np.zeros_like(img_array)
-        result[..., 3] = 255  # 设置alpha通道
-
-        if bg_type == 'dark':
-            # 深色背景（黑底）：只改变亮色像素（文字）
-            is_text = luminance > 100
-            result[is_text, 0] = text_r  # R
-            result[is_text, 1] = text_g  # G
-            result[is_text, 2] = text_b  # B
-            result[is_text, 3] = img_array[is_text, 3]  # 保留原透明度
-
-            # 暗色像素（背景）保持黑色
-            result[~is_text, 0] = 0
-            result[~is_text, 1] = 0
-            result[~is_text, 2] = 0
-            result[~is_text, 3] = img_array[~is_text, 3]  # 保留原透明度
-        else:
-            # 浅色背景（白底）：改变暗色像素（文字）
-            is_text = luminance < 150
-            result[is_text, 0] = text_r  # R
-            result[is_text, 1] = text_g  # G
-            result[is_text, 2] = text_b  # B
-            result[is_text, 3] = img_array[is_text, 3]  # 保留原透明度
-
-            # 亮色像素（背景）变黑色
-            result[~is_text, 0] = 0
-            result[~is_text, 1] = 0
-            result[~is_text, 2] = 0
-            result[~is_text, 3] = img_array[~is_text, 3]  # 保留原透明度
-
-        # 保留原图透明区域
-        transparent_mask = img_array[..., 3] == 0
-        result[transparent_mask, 3] = 0
-
-        return Image.fromarray(result)
-
-    except Exception as e:
-        print(f"应用变色效果失败: {e}")
-        return image
-
-def apply_yellow_text_effect(image, text_r=187, text_g=159, text_b=97, use_quality_mode=False, auto_mode=False):
-    """智能变色效果 - 统一入口函数
-    
-    Args:
-        image: PIL.Image对象
-        text_r, text_g, text_b: 目标颜色的RGB值
-        use_quality_mode: True=高质量模式(V1.4), False=快速模式(V1.5默认)
-        auto_mode: True=智能模式（自动判断），优先级高于use_quality_mode
-    
-    Returns:
-        PIL.Image: 应用效果后的图片
-    """
-    # 智能模式：自动判断是否使用高质量算法
-    if auto_mode:
-        # 判断图片是否带透明通道
-        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
-        
-        if has_alpha:
-            # 带透明通道，使用高质量模式
-            return apply_yellow_text_effect_quality(image, text_r, text_g, text_b)
-        else:
-            # 不带透明通道，使用快速模式
-            return apply_yellow_text_effect_fast(image, text_r, text_g, text_b)
-    
-    # 手动模式
-    if use_quality_mode:
-        return apply_yellow_text_effect_quality(image, text_r, text_g, text_b)
-    else:
-        return apply_yellow_text_effect_fast(image, text_r, text_g, text_b)
+# 效果预览：样张的最大尺寸，以及颜色输入停止变化多久后才重新渲染（连续输入时只渲染最后一次）
+PREVIEW_MAX_SIZE = (480, 360)
+PREVIEW_DEBOUNCE_MS = 60
+PREVIEW_ENGINE_NAMES = {'fast': "快速模式", 'quality': "高质量模式", 'smooth': "抗锯齿模式"}
 
-def process_images(folder_path, output_folder, invert=False, text_r=187, text_g=159, text_b=97, enable_compression=True, compression_quality=82):
-    """处理文件夹中的图片并按规则拼接，可选择是否反色处理"""
-    # 转换为 Path 对象
-    folder_path = Path(folder_path)
-    output_folder = Path(output_folder)
-    
-    # 确保输出文件夹存在
-    output_folder.mkdir(parents=True, exist_ok=True)
-    
-    # 获取所有图片文件
-    image_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.gif'}
-    image_files = [f.name for f in folder_path.iterdir() 
-                   if f.is_file() and f.suffix.lower() in image_extensions]
-    
-    # 按歌名分组
-    song_groups = {}
-    for img_file in image_files:
-        info = extract_info(img_file)
-        if info:
-            song_number, song_name, page_number = info
-            key = f"{song_number}_{song_name}"
-            if key not in song_groups:
-                song_groups[key] = []
-            song_groups[key].append((page_number, folder_path / img_file))
-    
-    # 处理每个歌曲组
-    for key, images in song_groups.items():
-        if len(images) > 1:  # 只处理有多个页面的歌曲
-            # 按页码排序
-            images.sort(key=lambda x: x[0])
-            
-            # 获取图片路径列表
-            image_paths = [str(img[1]) for img in images]
-            
-            # 拼接图片
-            result_img = vertical_concat_images(image_paths)
-            
-            # 如果需要反色处理
-            if invert:
-                result_img = apply_yellow_text_effect(result_img, text_r, text_g, text_b, use_quality_mode=False, auto_mode=False)
-            
-            # 保存结果
-            song_number, song_name = key.split('_', 1)
-            suffix = "_反色拼接" if invert else "_拼接"
-            output_filename = f"第{song_number}首_{song_name}{suffix}.jpg"
-            output_path = output_folder / output_filename
-            
-            # 根据压缩设置保存
-            if enable_compression:
-                result_img.save(output_path, format='JPEG', quality=compression_quality, optimize=True, progressive=True)
-            else:
-                result_img.save(output_path, quality=95)
+# 保存在config.json中的设置及默认值：处理设置的默认值只在 DEFAULT_SETTINGS 中定义
+# （process_mode由界面的单选按钮决定，profile_run只对单次运行有效，都不保存），另加界面的日志过滤开关
+CONFIG_DEFAULTS = {key: value for key, value in DEFAULT_SETTINGS.items() if key not in ('process_mode', 'profile_run')}
+CONFIG_DEFAULTS['log_errors_only'] = False
 
 class ImageProcessorApp:
     def __init__(self, root):
         self.root = root
         self.root.title(f"图片批量拼接与反色处理工具 V{__version__}")
-        self.root.geometry("700x700")  # 增加窗口高度以适应新的压缩设置
+        self.root.geometry("700x760")  # 增加窗口高度以适应压缩和性能分析设置
         self.root.resizable(True, True)
 
         # 设置窗口图标
@@ -355,32 +61,44 @@ class ImageProcessorApp:
         
         # 获取配置文件路径，兼容打包后的EXE
         self.config_path = self.get_config_path()
-        self.input_folder = ""
-        self.output_folder = ""
-        
-        # 黄字效果RGB默认值（秋麒麟色）
-        self.yellow_text_r = 218
-        self.yellow_text_g = 165
-        self.yellow_text_b = 32
-        
+
+        # 设置的默认值（文件夹、颜色、算法模式、压缩、并发、性能分析、日志过滤），之后由 load_config 覆盖
+        for key, value in CONFIG_DEFAULTS.items():
+            setattr(self, key, value)
+
         # 用于实际处理逻辑的变量
         self.invert = tk.BooleanVar(value=False)
         self.only_invert = tk.BooleanVar(value=True)  # 默认选择仅反色
         self.only_concat = tk.BooleanVar(value=False)
-        
-        # 算法模式选择（默认智能模式）
-        self.use_quality_mode = False
-        self.use_auto_mode = True  # 默认启用智能模式
-        
-        # 压缩设置（默认开启压缩）
-        self.enable_compression = True
-        self.compression_quality = 82  # 默认质量82（最佳平衡点）
-        
+
+        # 处理线程发往界面的事件（日志/进度/状态），只在界面线程中取出并更新控件
+        self.ui_events = queue.SimpleQueue()
+        self.control = None  # 当前批处理的取消/暂停控制（未在处理时为None）
+
+        # 效果预览窗口（未打开时为None）
+        self.preview_window = None
+        self.preview_source = None   # 当前样张的 RecolorPreview
+        self.preview_name = ""
+        self.preview_index = 0       # 样张是输入文件夹中的第几张图片
+        self.preview_photo = None
+        self.preview_pending = None  # 防抖：尚未执行的渲染（root.after的id）
+
+        # 日志：界面只保留最近的行（全部/仅错误警告各一份，切换过滤时直接重绘），完整日志写入文件
+        self.log_lines = deque(maxlen=LOG_VIEW_MAX_LINES)
+        self.problem_log_lines = deque(maxlen=LOG_VIEW_MAX_LINES)
+        self.file_logger = create_file_logger()
+
         self.create_widgets()
         self.load_config()  # 初始化时加载配置
         
         # 确保模式选择和内部变量一致
         self.update_mode()
+
+        # 定时刷新界面事件
+        self.root.after(UI_REFRESH_MS, self.drain_ui_events)
+
+        # 窗口显示后在后台预热处理模块
+        self.root.after(WARM_UP_DELAY_MS, self.start_warm_up)
         
         # 初始化压缩状态UI
         if hasattr(self, 'quality_scale'):
@@ -389,34 +107,18 @@ class ImageProcessorApp:
             else:
                 self.quality_scale.config(state='disabled')
 
+    def start_warm_up(self):
+        """在后台线程导入NumPy/Pillow和处理模块（启动时不导入，窗口可以更快显示），第一次点击运行时不用再等"""
+        def warm_up():
+            try:
+                picstitcher.warm_up()
+            except Exception as e:
+                self.log(f"⚠ 后台预热失败（不影响处理）: {str(e)}")
+        threading.Thread(target=warm_up, daemon=True).start()
+
     def get_config_path(self):
         """获取配置文件路径，兼容打包后的EXE环境"""
-        try:
-            import sys
-            
-            # 检查是否是打包后的可执行文件
-            if getattr(sys, 'frozen', False):
-                # 打包后的环境，使用可执行文件所在目录
-                if hasattr(sys, '_MEIPASS'):
-                    # PyInstaller 打包
-                    exe_dir = Path(sys.executable).parent
-                else:
-                    # 其他打包工具
-                    exe_dir = Path(sys.argv[0]).parent
-                config_path = exe_dir / 'config.json'
-                print(f"检测到打包环境，配置文件路径: {config_path}")
-            else:
-                # 开发环境，使用脚本文件所在目录
-                config_path = Path(__file__).parent / 'config.json'
-            
-            return config_path
-            
-        except Exception as e:
-            print(f"获取配置文件路径失败: {e}")
-            # 备用方案：使用当前工作目录
-            fallback_path = Path.cwd() / 'config.json'
-            print(f"使用备用路径: {fallback_path}")
-            return fallback_path
+        return get_config_path()
 
     def set_window_icon(self):
         """设置窗口图标"""
@@ -526,6 +228,20 @@ class ImageProcessorApp:
                        variable=self.algorithm_mode, value="quality",
                        command=self.update_algorithm_mode).pack(side=tk.LEFT, padx=5)
 
+        # 模式四：抗锯齿模式
+        ttk.Radiobutton(algo_inner_frame, text="抗锯齿模式", 
+                       variable=self.algorithm_mode, value="smooth",
+                       command=self.update_algorithm_mode).pack(side=tk.LEFT, padx=5)
+
+        # 自动阈值（褪色、偏暗的扫描件不丢笔画；高质量模式不受影响）
+        self.auto_threshold_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            algo_inner_frame,
+            text="自动阈值",
+            variable=self.auto_threshold_var,
+            command=self.update_auto_threshold
+        ).pack(side=tk.LEFT, padx=(20, 5))
+
         # 压缩设置框架
         compression_frame = ttk.LabelFrame(main_frame, text="压缩设置")
         compression_frame.pack(fill=tk.X, pady=10)
@@ -571,6 +287,48 @@ class ImageProcessorApp:
         info_text = "💡 质量70-75=高压缩(体积最小), 80-85=均衡(推荐), 90-95=高质量(接近原图)"
         ttk.Label(comp_info_frame, text=info_text, foreground="gray", font=('Arial', 8)).pack(side=tk.LEFT)
 
+        # 性能分析框架
+        perf_frame = ttk.LabelFrame(main_frame, text="性能分析")
+        perf_frame.pack(fill=tk.X, pady=10)
+
+        perf_inner_frame = ttk.Frame(perf_frame)
+        perf_inner_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        # 分阶段计时复选框
+        self.timing_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            perf_inner_frame,
+            text="记录各阶段耗时",
+            variable=self.timing_var,
+            command=self.update_perf_options
+        ).pack(side=tk.LEFT, padx=5)
+
+        # 保存JSON复选框
+        self.timing_json_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            perf_inner_frame,
+            text="统计结果保存为JSON",
+            variable=self.timing_json_var,
+            command=self.update_perf_options
+        ).pack(side=tk.LEFT, padx=5)
+
+        # 内存峰值复选框
+        self.memory_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            perf_inner_frame,
+            text="记录内存峰值",
+            variable=self.memory_var,
+            command=self.update_perf_options
+        ).pack(side=tk.LEFT, padx=5)
+
+        # 采样剖析复选框（只对本次运行生效，不保存到配置）
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            perf_inner_frame,
+            text="剖析本次运行（生成火焰图文件）",
+            variable=self.profile_var
+        ).pack(side=tk.LEFT, padx=5)
+
         # RGB颜色设置区域 - 增强版
         rgb_frame = ttk.LabelFrame(main_frame, text="颜色设置")
         rgb_frame.pack(fill=tk.X, pady=10)
@@ -620,6 +378,9 @@ class ImageProcessorApp:
                                       font=('Arial', 9))
         self.color_preview.pack(side=tk.LEFT, padx=10)
 
+        # 效果预览（用输入文件夹中的图片实时显示当前颜色和算法的效果）
+        ttk.Button(color_input_frame, text="效果预览", command=self.open_preview).pack(side=tk.LEFT)
+
         # 预设颜色按钮区域
         preset_frame = ttk.Frame(rgb_frame)
         preset_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -646,7 +407,7 @@ class ImageProcessorApp:
             btn.pack(side=tk.LEFT, padx=2)
 
         # 添加大号运行按钮
-        run_button = tk.Button(option_frame, text="运行程序",
+        self.run_button = run_button = tk.Button(option_frame, text="运行程序",
                               command=self.start_processing,
                               font=('Arial', 12, 'bold'),
                               bg='#4CAF50',  # 绿色背景
@@ -655,6 +416,20 @@ class ImageProcessorApp:
                               width=15)      # 增加按钮宽度
         run_button.pack(side=tk.RIGHT, padx=10)
 
+        # 取消/暂停按钮（只在处理中可用）
+        self.cancel_button = ttk.Button(option_frame, text="取消", command=self.cancel_processing, state='disabled')
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+        self.pause_button = ttk.Button(option_frame, text="暂停", command=self.toggle_pause, state='disabled')
+        self.pause_button.pack(side=tk.RIGHT, padx=5)
+
+        # 监视模式复选框（只对本次运行生效，不保存到配置）
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            option_frame,
+            text="监视模式（持续处理新文件）",
+            variable=self.watch_var
+        ).pack(side=tk.RIGHT, padx=5)
+
         # 进度条
         progress_frame = ttk.Frame(main_frame)
         progress_frame.pack(fill=tk.X, pady=10)
@@ -691,6 +466,19 @@ class ImageProcessorApp:
         log_frame = ttk.LabelFrame(main_frame, text="处理日志")
         log_frame.pack(fill=tk.BOTH, expand=True, pady=10)
 
+        # 日志过滤（界面只显示最近的日志，完整日志保存在logs文件夹）
+        log_option_frame = ttk.Frame(log_frame)
+        log_option_frame.pack(side=tk.TOP, fill=tk.X)
+
+        self.log_errors_only_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            log_option_frame,
+            text="仅显示错误/警告",
+            variable=self.log_errors_only_var,
+            command=self.update_log_filter
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(log_option_frame, text=f"（显示最近{LOG_VIEW_MAX_LINES}行，完整日志见logs文件夹）").pack(side=tk.LEFT)
+
         self.log_text = tk.Text(log_frame, height=10, wrap=tk.WORD)
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
@@ -784,31 +572,22 @@ class ImageProcessorApp:
                 with self.config_path.open('r', encoding='utf-8') as f:
                     cfg = json.load(f)
 
-                self.input_folder = cfg.get('input_folder', '')
-                self.output_folder = cfg.get('output_folder', '')
-
-                # 加载黄字效果RGB配置，如果不存在则使用默认值（秋麒麟色）
-                self.yellow_text_r = cfg.get('yellow_text_r', 218)
-                self.yellow_text_g = cfg.get('yellow_text_g', 165)
-                self.yellow_text_b = cfg.get('yellow_text_b', 32)
+                # 缺失的键使用默认值
+                for key, default in CONFIG_DEFAULTS.items():
+                    setattr(self, key, cfg.get(key, default))
+                if hasattr(self, 'auto_threshold_var'):
+                    self.auto_threshold_var.set(self.auto_threshold)
+                if hasattr(self, 'log_errors_only_var'):
+                    self.log_errors_only_var.set(self.log_errors_only)
 
-                # 加载算法模式配置
-                use_auto = cfg.get('use_auto_mode', True)  # 默认智能模式
-                use_quality = cfg.get('use_quality_mode', False)
-                
-                self.use_auto_mode = use_auto
-                self.use_quality_mode = use_quality
-                
-                # 加载压缩设置
-                self.enable_compression = cfg.get('enable_compression', True)
-                self.compression_quality = cfg.get('compression_quality', 82)
-                
                 # 更新算法模式UI（如果已创建）
                 if hasattr(self, 'algorithm_mode'):
-                    if use_auto:
+                    if self.use_auto_mode:
                         self.algorithm_mode.set("auto")
-                    elif use_quality:
+                    elif self.use_quality_mode:
                         self.algorithm_mode.set("quality")
+                    elif self.use_smooth_mode:
+                        self.algorithm_mode.set("smooth")
                     else:
                         self.algorithm_mode.set("fast")
                 
@@ -819,6 +598,12 @@ class ImageProcessorApp:
                     self.quality_var.set(self.compression_quality)
                 if hasattr(self, 'quality_label'):
                     self.quality_label.config(text=str(self.compression_quality))
+
+                # 更新性能分析UI（如果已创建）
+                if hasattr(self, 'timing_var'):
+                    self.timing_var.set(self.enable_timing)
+                    self.timing_json_var.set(self.save_timing_json)
+                    self.memory_var.set(self.track_memory)
                 # 根据压缩状态设置滑块状态
                 if hasattr(self, 'quality_scale'):
                     if self.enable_compression:
@@ -863,16 +648,8 @@ class ImageProcessorApp:
             print(f"目录是否可写: {config_dir.is_dir() and os.access(config_dir, os.W_OK)}")
 
             default_cfg = {
-                'input_folder': '',
-                'output_folder': '',
-                'yellow_text_r': 218,
-                'yellow_text_g': 165,
-                'yellow_text_b': 32,
-                'use_quality_mode': False,
-                'use_auto_mode': True,
-                'enable_compression': True,
-                'compression_quality': 82,
-                '_comment': '配置说明：yellow_text_r/g/b 为黄字效果的RGB颜色值(0-255)，默认秋麒麟色(218,165,32)，use_auto_mode为True使用智能模式(推荐)，use_quality_mode为True使用高质量模式，两者都为False使用快速模式，enable_compression为True启用压缩，compression_quality为压缩质量(70-95)'
+                **CONFIG_DEFAULTS,
+                '_comment': '配置说明：yellow_text_r/g/b 为黄字效果的RGB颜色值(0-255)，默认秋麒麟色(218,165,32)，use_auto_mode为True使用智能模式(推荐)，use_quality_mode为True使用高质量模式，use_smooth_mode为True使用抗锯齿模式（文字边缘平滑过渡，前两者都为False时生效），都为False使用快速模式，auto_threshold为True时快速/抗锯齿模式按每张图片的亮度直方图自动选阈值（适合褪色或偏暗的扫描件），group_levels为True时反色+拼接按整首歌各页的亮度直方图统一决定背景类型和阈值（不对画布中心采样，补的白边不参与判断），recolor_pages为True时反色+拼接先在多个线程中逐页变色再拼接（结果与拼接后再变色相同，需要group_levels），band_min_pixels为单张图片（或拼接后的整首歌）按行分块并行变色的像素数下限（超过时一张图片也能用满多核，0表示不分块），enable_compression为True启用压缩，compression_quality为压缩质量(70-95)，io_workers为读写文件的I/O线程数，prefetch_ahead为提前读入内存的文件数（输入输出在网络共享盘时可调大），use_mmap为True时用mmap读取输入（仅建议本地磁盘），plan_inputs为True时处理前先并行读取所有文件头（不解码），统一报告无法识别的文件并估算画布尺寸和内存，largest_first为True时仅反色模式按文件头估算的像素数从大到小处理（需要plan_inputs；拼接模式逐首处理，保持原顺序），adaptive_workers为True时按实测吞吐量在min_workers到max_workers之间自动调整CPU线程数（max_workers为0表示CPU核数；为False时固定使用max_workers个线程，0表示4个），enable_timing为True时在日志中输出各阶段耗时统计，save_timing_json为True时同时保存统计JSON到输出文件夹，track_memory为True时记录每张图片/每首歌的内存峰值并列出占用最高的任务，log_errors_only为True时日志框只显示错误和警告（完整日志始终写入logs文件夹）'
             }
 
             print(f"准备创建配置文件: {self.config_path}")
@@ -897,20 +674,14 @@ class ImageProcessorApp:
             print(f"配置文件路径: {self.config_path}")
             print(f"错误类型: {type(e).__name__}")
 
+    def current_settings(self):
+        """当前界面上的设置（键与config.json一致）"""
+        return {key: getattr(self, key) for key in CONFIG_DEFAULTS}
+
     def save_config(self):
         """保存当前输入输出文件夹路径和黄字效果RGB配置"""
         try:
-            cfg = {
-                'input_folder': self.input_folder,
-                'output_folder': self.output_folder,
-                'yellow_text_r': self.yellow_text_r,
-                'yellow_text_g': self.yellow_text_g,
-                'yellow_text_b': self.yellow_text_b,
-                'use_quality_mode': self.use_quality_mode,
-                'use_auto_mode': self.use_auto_mode,
-                'enable_compression': self.enable_compression,
-                'compression_quality': self.compression_quality
-            }
+            cfg = self.current_settings()
             with self.config_path.open('w', encoding='utf-8') as f:
                 json.dump(cfg, f, ensure_ascii=False, indent=2)
         except Exception as e:
@@ -1008,6 +779,100 @@ class ImageProcessorApp:
         text_color = "white" if brightness < 128 else "black"
         self.color_preview.config(fg=text_color)
 
+        self.schedule_preview()
+
+    def open_preview(self):
+        """打开效果预览窗口：输入文件夹中的图片缩小后按当前颜色和算法模式变色，修改颜色时实时刷新"""
+        if self.preview_window is not None:
+            self.preview_window.lift()
+            return
+        self.preview_window = window = tk.Toplevel(self.root)
+        window.title("效果预览")
+        window.protocol("WM_DELETE_WINDOW", self.close_preview)
+
+        self.preview_label = ttk.Label(window)
+        self.preview_label.pack(padx=10, pady=10)
+        self.preview_info_var = tk.StringVar(value="")
+        ttk.Label(window, textvariable=self.preview_info_var).pack(padx=10)
+        button_frame = ttk.Frame(window)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="上一张", command=lambda: self.load_preview_source(-1)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="下一张", command=lambda: self.load_preview_source(1)).pack(side=tk.LEFT, padx=5)
+
+        self.load_preview_source(0)
+
+    def close_preview(self):
+        if self.preview_pending is not None:
+            self.root.after_cancel(self.preview_pending)
+            self.preview_pending = None
+        self.preview_window.destroy()
+        self.preview_window = self.preview_source = self.preview_photo = None
+
+    def load_preview_source(self, step):
+        """在后台线程加载输入文件夹中的一张图片作为样张（step: 0=当前, 1=下一张, -1=上一张）"""
+        folder = Path(self.input_entry.get())
+        try:
+            files = sorted(f.name for f in folder.iterdir() if f.is_file() and f.suffix.lower() in IMAGE_EXTENSIONS)
+        except OSError:
+            files = []
+        if not files:
+            self.preview_info_var.set("输入文件夹中没有图片")
+            return
+        self.preview_index = (self.preview_index + step) % len(files)
+        path = folder / files[self.preview_index]
+        self.preview_info_var.set(f"正在加载: {path.name}")
+
+        def load():
+            try:
+                preview = picstitcher.RecolorPreview.open(path, PREVIEW_MAX_SIZE)
+            except Exception as e:
+                preview = e
+            self.ui_events.put(('preview', (path, preview)))
+        threading.Thread(target=load, daemon=True).start()
+
+    def set_preview_source(self, path, preview):
+        """样张加载完成（在界面线程调用）"""
+        if self.preview_window is None:
+            return
+        if isinstance(preview, Exception):
+            self.preview_info_var.set(f"无法预览 {path.name}: {str(preview)}")
+            return
+        self.preview_source = preview
+        self.preview_name = path.name
+        self.preview_photo = None  # 尺寸可能不同，重新创建
+        self.render_preview()
+
+    def schedule_preview(self):
+        """颜色或算法改变后延迟渲染预览；在延迟内再次改变时只渲染最后一次（输入时不会每个字符都渲染）"""
+        if self.preview_source is None:
+            return
+        if self.preview_pending is not None:
+            self.root.after_cancel(self.preview_pending)
+        self.preview_pending = self.root.after(PREVIEW_DEBOUNCE_MS, self.render_preview)
+
+    def render_preview(self):
+        """按当前颜色和算法模式渲染预览（文字掩码已缓存，只需填色，几毫秒）"""
+        from PIL import ImageTk
+
+        self.preview_pending = None
+        if self.preview_source is None:
+            return
+        settings = self.current_settings()
+        algorithm = get_algorithm(settings)
+        start = time.perf_counter()
+        image = self.preview_source.render((self.yellow_text_r, self.yellow_text_g, self.yellow_text_b), algorithm,
+                                           settings['auto_threshold'])
+        if self.preview_photo is None:
+            self.preview_photo = ImageTk.PhotoImage(image)
+            self.preview_label.config(image=self.preview_photo)
+        else:
+            self.preview_photo.paste(image)  # 原地更新，不重新创建Tk图片
+        elapsed = (time.perf_counter() - start) * 1000
+
+        engine = PREVIEW_ENGINE_NAMES[self.preview_source.engine(algorithm)]
+        width, height = self.preview_source.source_size
+        self.preview_info_var.set(f"{self.preview_name}（{width}x{height}，缩小显示）| {engine} | 渲染 {elapsed:.1f} ms")
+
     def set_preset_color(self, r, g, b):
         """设置预设颜色"""
         # 更新RGB输入框
@@ -1038,52 +903,95 @@ class ImageProcessorApp:
             self.save_config()  # 选择后保存
 
     def log(self, message):
-        """添加日志信息到日志框"""
-        self.log_text.insert(tk.END, message + "\n")
+        """添加日志信息到日志框（可在任意线程调用，由界面线程批量写入），同时写入日志文件"""
+        self.ui_events.put(('log', message))
+        if self.file_logger:
+            self.file_logger.log(classify_log_message(message), message)
+
+    def show_log_lines(self, lines):
+        """在日志框末尾追加若干行，超出LOG_VIEW_MAX_LINES的旧行从顶部删除"""
+        if not lines:
+            return
+        lines = lines[-LOG_VIEW_MAX_LINES:]
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        # 末尾换行后还有一个空行，所以实际行数为 end-1c 的行号减一
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - LOG_VIEW_MAX_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
         self.log_text.see(tk.END)
-    
-    def save_image_with_compression(self, image, output_path):
-        """根据压缩设置保存图片
-        
-        Args:
-            image: PIL.Image对象
-            output_path: 输出路径
+
+    def clear_log(self):
+        """清空日志框和最近日志缓存（日志文件保留）"""
+        self.log_text.delete(1.0, tk.END)
+        self.log_lines.clear()
+        self.problem_log_lines.clear()
+
+    def update_log_filter(self):
+        """切换"仅显示错误/警告"，从最近日志缓存重绘日志框"""
+        self.log_errors_only = self.log_errors_only_var.get()
+        self.log_text.delete(1.0, tk.END)
+        self.show_log_lines(list(self.problem_log_lines if self.log_errors_only else self.log_lines))
+        self.save_config()
+
+    def set_status(self, text):
+        """更新状态文字（可在任意线程调用）"""
+        self.ui_events.put(('status', text))
+
+    def drain_ui_events(self):
+        """在界面线程中取出积压的事件：日志合并为一次插入，进度和状态只显示最新值
+
+        无论一次处理多少文件，每个刷新周期最多只插入一次日志、设置一次进度条，界面开销保持恒定。
         """
-        # 确保图像是RGB模式（没有透明通道）
-        if image.mode == 'RGBA':
-            image = image.convert('RGB')
-        
-        if self.enable_compression:
-            # 启用压缩：使用优化参数
-            image.save(
-                output_path,
-                format='JPEG',
-                quality=self.compression_quality,
-                optimize=True,
-                progressive=True
-            )
-        else:
-            # 不压缩：使用高质量参数
-            image.save(
-                output_path,
-                format='JPEG',
-                quality=95
-            )
+        lines = []
+        progress = status = None
+        try:
+            while True:
+                kind, payload = self.ui_events.get_nowait()
+                if kind == 'log':
+                    lines.append(payload)
+                elif kind == 'progress':
+                    progress = payload
+                    status = f"进度: {payload[2]}%"
+                    if payload[3]:
+                        status += " | " + format_progress_stats(payload[3])
+                elif kind == 'done':
+                    self.on_processing_done()
+                elif kind == 'preview':
+                    self.set_preview_source(*payload)
+                else:
+                    status = payload
+        except queue.Empty:
+            pass
 
-    def update_progress(self, value, maximum, percent=None):
-        """更新进度条和状态"""
-        if maximum > 0:
+        if lines:
+            problems = [line for line in lines if classify_log_message(line) != logging.INFO]
+            self.log_lines.extend(lines)
+            self.problem_log_lines.extend(problems)
+            self.show_log_lines(problems if self.log_errors_only else lines)
+        if progress:
+            value, maximum = progress[:2]
             self.progress['maximum'] = maximum
-            self.progress['value'] = min(value, maximum)
+            self.progress['value'] = value
+        if status is not None:
+            self.status_var.set(status)
 
+        self.root.after(UI_REFRESH_MS, self.drain_ui_events)
+    
+    def update_progress(self, value, maximum, percent=None, stats=None):
+        """更新进度条和状态（可在任意线程调用，界面线程只显示最新一次进度）
+
+        stats为吞吐量和剩余时间（见 ThroughputMeter.snapshot），显示在状态栏的进度后面。
+        """
+        if maximum > 0:
             if percent is None:
                 percent = int((value / maximum) * 100)
 
-            self.status_var.set(f"进度: {percent}%")
-            # 强制更新界面
-            self.root.update_idletasks()
+            self.ui_events.put(('progress', (min(value, maximum), maximum, percent, stats)))
 
     def start_processing(self):
+        if self.control is not None:
+            return  # 上一批还在处理中
+
         # 获取输入和输出文件夹
         self.input_folder = self.input_entry.get()
         self.output_folder = self.output_entry.get()
@@ -1098,20 +1006,28 @@ class ImageProcessorApp:
             messagebox.showerror("错误", "请选择输出文件夹")
             return
 
+        if self.watch_var.get() and Path(self.output_folder).resolve() == Path(self.input_folder).resolve():
+            messagebox.showerror("错误", "监视模式下输出文件夹不能与输入文件夹相同")
+            return
+
         # 确保输出文件夹存在
         Path(self.output_folder).mkdir(parents=True, exist_ok=True)
 
         # 清空日志
-        self.log_text.delete(1.0, tk.END)
+        self.clear_log()
         
         # 显示当前使用的算法模式
         if self.use_auto_mode:
             mode_name = "🧠 智能模式（自动判断：带透明用V1.4，其他用V1.5）"
         elif self.use_quality_mode:
             mode_name = "🎨 高质量模式（V1.4经典算法）"
+        elif self.use_smooth_mode:
+            mode_name = "✨ 抗锯齿模式（查表混合，文字边缘平滑）"
         else:
             mode_name = "⚡ 快速模式（V1.5优化算法）"
         self.log(f"当前算法模式: {mode_name}")
+        if self.auto_threshold:
+            self.log("阈值: 🎚 自动（按每张图片的亮度直方图）")
         
         # 显示压缩设置
         if self.enable_compression:
@@ -1121,184 +1037,81 @@ class ImageProcessorApp:
         
         self.log("=" * 50)
 
-        # 在新线程中处理图片，避免界面卡死
+        # 在新线程中处理图片，避免界面卡死（设置在界面线程中读取好，处理线程不访问Tk控件）
         self.status_var.set("正在处理...")
-        threading.Thread(target=self.process_in_thread, daemon=True).start()
+        settings = self.collect_run_settings()
+        self.control = picstitcher.BatchControl()
+        self.run_button.config(state='disabled')
+        self.pause_button.config(state='normal', text="暂停")
+        self.cancel_button.config(state='normal')
+        threading.Thread(target=self.process_in_thread, args=(settings, self.control), daemon=True).start()
+
+    def toggle_pause(self):
+        """暂停/继续当前批处理（暂停后正在进行的任务会完成，不再开始新任务）"""
+        if self.control is None:
+            return
+        if self.control.paused:
+            self.control.resume()
+            self.pause_button.config(text="暂停")
+            self.status_var.set("正在处理...")
+        else:
+            self.control.pause()
+            self.pause_button.config(text="继续")
+            self.status_var.set("已暂停（正在进行的任务完成后暂停）")
 
-    def process_in_thread(self):
+    def cancel_processing(self):
+        """取消当前批处理：不再开始新任务，已开始的任务完成后停止"""
+        if self.control is None:
+            return
+        self.control.cancel()
+        self.pause_button.config(state='disabled')
+        self.cancel_button.config(state='disabled')
+        self.status_var.set("正在取消...")
+
+    def on_processing_done(self):
+        """处理线程结束后恢复按钮状态（在界面线程调用）"""
+        self.control = None
+        self.run_button.config(state='normal')
+        self.pause_button.config(state='disabled', text="暂停")
+        self.cancel_button.config(state='disabled')
+
+    def collect_run_settings(self):
+        """收集本次运行的处理设置（必须在界面线程调用）"""
+        # 确保当前模式与单选按钮选择一致
+        mode = self.process_mode.get()
+        if mode == "invert_concat" and not self.invert.get():
+            self.update_mode()
+        elif mode == "invert_only" and not self.only_invert.get():
+            self.update_mode()
+        elif mode == "concat" and not self.only_concat.get():
+            self.update_mode()
+
+        settings = self.current_settings()
+        settings['process_mode'] = self.process_mode.get()
+        settings['profile_run'] = self.profile_var.get()
+        settings['watch'] = self.watch_var.get()
+        return settings
+
+    def process_in_thread(self, settings, control=None):
         try:
-            # 获取所有图片文件
-            input_path = Path(self.input_folder)
-            image_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.gif'}
-            image_files = [f.name for f in input_path.iterdir()
-                          if f.is_file() and f.suffix.lower() in image_extensions]
-
-            # 确保当前模式与单选按钮选择一致
-            mode = self.process_mode.get()
-            if mode == "invert_concat" and not self.invert.get():
-                self.update_mode()
-            elif mode == "invert_only" and not self.only_invert.get():
-                self.update_mode()
-            elif mode == "concat" and not self.only_concat.get():
-                self.update_mode()
-
-            if self.only_invert.get():
-                # 仅执行反色处理 - 使用多线程加速
-                total_files = len(image_files)
-                self.update_progress(0, total_files, 0)
-
-                # 如果文件数量>=5，使用多线程并行处理（4线程）
-                if total_files >= 5:
-                    self.log(f"🚀 启用多线程加速模式（{min(4, total_files)}线程）...")
-                    
-                    def process_single_file(img_file):
-                        """处理单个文件"""
-                        input_img_path = input_path / img_file
-                        output_img_path = Path(self.output_folder) / img_file
-                        try:
-                            img = Image.open(input_img_path)
-                            img.load()
-                            inverted_img = apply_yellow_text_effect(img, self.yellow_text_r, self.yellow_text_g, self.yellow_text_b, use_quality_mode=self.use_quality_mode, auto_mode=self.use_auto_mode)
-                            # 使用压缩设置保存
-                            self.save_image_with_compression(inverted_img, output_img_path)
-                            return True, img_file
-                        except Exception as e:
-                            return False, f"{img_file}: {str(e)}"
-                    
-                    # 使用线程池并行处理
-                    completed = 0
-                    with ThreadPoolExecutor(max_workers=min(4, total_files)) as executor:
-                        futures = [executor.submit(process_single_file, img_file) for img_file in image_files]
-                        
-                        for future in futures:
-                            success, info = future.result()
-                            completed += 1
-                            if success:
-                                self.log(f"✓ 已反色并保存: {info}")
-                            else:
-                                self.log(f"✗ 处理出错: {info}")
-                            self.update_progress(completed, total_files)
-                else:
-                    # 文件少，单线程处理
-                    for i, img_file in enumerate(image_files):
-                        input_img_path = input_path / img_file
-                        output_img_path = Path(self.output_folder) / img_file
-                        self.status_var.set(f"正在处理: {img_file}")
-
-                        try:
-                            img = Image.open(input_img_path)
-                            img.load()
-                            inverted_img = apply_yellow_text_effect(img, self.yellow_text_r, self.yellow_text_g, self.yellow_text_b, use_quality_mode=self.use_quality_mode, auto_mode=self.use_auto_mode)
-                            # 使用压缩设置保存
-                            self.save_image_with_compression(inverted_img, output_img_path)
-                            self.log(f"已反色并保存: {img_file}")
-                        except Exception as e:
-                            self.log(f"处理 {img_file} 时出错: {str(e)}")
-
-                        self.update_progress(i + 1, total_files)
-            else:
-                # 按歌名分组
-                song_groups = {}
-                for img_file in image_files:
-                    info = extract_info(img_file)
-                    if info:
-                        song_number, song_name, page_number = info
-                        key = f"{song_number}_{song_name}"
-                        if key not in song_groups:
-                            song_groups[key] = []
-                        song_groups[key].append((page_number, input_path / img_file))
-
-                # 设置进度条
-                total_songs = len(song_groups)
-                # 避免除以零错误
-                if total_songs == 0:
-                    self.log("没有找到可处理的歌曲，请检查文件命名格式")
-                    self.update_progress(1, 1, 100)  # 直接设置为完成状态
-                else:
-                    self.update_progress(0, total_songs, 0)
-
-                # 处理每个歌曲组
-                processed_count = 0
-                for key, images in song_groups.items():
-                    # 按页码排序
-                    images.sort(key=lambda x: x[0])
-
-                    # 获取图片路径列表
-                    image_paths = [img[1] for img in images]
-
-                    # 更新状态
-                    song_number, song_name = key.split('_', 1)
-                    self.status_var.set(f"正在处理: 第{song_number}首 {song_name}")
-
-                    # 如果只有一张图片且不是仅拼接模式，直接打开它而不是拼接
-                    if len(images) == 1 and not self.only_concat.get():
-                        try:
-                            # 打开图片
-                            result_img = Image.open(image_paths[0])
-                            result_img.load()
-                        except Exception as e:
-                            # 跳过这首歌
-                            self.log(f"打开图片出错: {str(e)}")
-                            continue
-                    else:
-                        # 拼接图片
-                        try:
-                            result_img = vertical_concat_images(image_paths)
-                        except Exception as e:
-                            self.log(f"拼接图片出错: {str(e)}")
-                            continue  # 跳过这首歌
-
-                    # 如果需要反色处理（不是仅拼接模式）
-                    if self.invert.get() and not self.only_concat.get():
-                        try:
-                            # 执行反色处理
-                            result_img = apply_yellow_text_effect(result_img, self.yellow_text_r, self.yellow_text_g, self.yellow_text_b, use_quality_mode=self.use_quality_mode, auto_mode=self.use_auto_mode)
-                        except Exception as e:
-                            # 但仍然继续处理，保存原始图像
-                            self.log(f"反色处理错误: {str(e)}")
-
-                    # 确保图像是RGB模式（没有透明通道）
-                    try:
-                        # 更新文件命名，恢复原始的命名规则
-                        output_filename = f"第{song_number}首 {song_name}.jpg"
-
-                        output_path = Path(self.output_folder) / output_filename
-                        # 使用压缩设置保存
-                        self.save_image_with_compression(result_img, output_path)
-
-                        # 记录日志
-                        if len(images) == 1 and not self.only_concat.get():
-                            if self.invert.get():
-                                log_msg = f"已反色处理并保存: {output_filename}"
-                            else:
-                                log_msg = f"已处理并保存: {output_filename}"
-                        else:
-                            if self.invert.get():
-                                log_msg = f"已反色拼接并保存: {output_filename}"
-                            elif self.only_concat.get():
-                                log_msg = f"已拼接并保存: {output_filename}"
-                            else:
-                                log_msg = f"已拼接并保存: {output_filename}"
-                        self.log(log_msg)
-                    except Exception as e:
-                        self.log(f"保存图片出错: {str(e)}")
-
-                    # 更新进度条
-                    processed_count += 1
-                    self.update_progress(processed_count, total_songs)
-
-            # 确保进度条显示100%完成
-            if self.progress['maximum'] > 0:  # 避免除以零错误
-                self.update_progress(self.progress['maximum'], self.progress['maximum'], 100)
-
-                # 只在状态栏显示完成信息
-                self.root.after(500, lambda: self.status_var.set("处理完成!"))
-            else:
-                self.status_var.set("处理完成!")
+            if settings.get('watch'):
+                # 监视模式：直到点击取消才结束，线程池在两批之间保持预热
+                processor = picstitcher.BatchProcessor(settings, log=self.log, progress=self.update_progress,
+                                                       status=self.set_status, control=control, keep_pool=True)
+                picstitcher.FolderWatcher(processor).run()
+                self.set_status("已停止监视")
+                return
+            processor = picstitcher.BatchProcessor(settings, log=self.log, progress=self.update_progress,
+                                                   status=self.set_status, control=control)
+            if processor.run():
+                # 只在状态栏显示完成信息（事件按顺序刷新，不会被最后的进度覆盖）
+                self.set_status("处理完成!")
 
         except Exception as e:
-            self.status_var.set(f"处理出错: {str(e)}")
+            self.set_status(f"处理出错: {str(e)}")
             self.log(f"错误详情: {str(e)}")
+        finally:
+            self.ui_events.put(('done', None))
 
     def update_mode(self):
         """根据选择的模式更新内部变量"""
@@ -1328,18 +1141,13 @@ class ImageProcessorApp:
         """更新算法模式选择"""
         mode = self.algorithm_mode.get()
         
-        if mode == "auto":
-            self.use_auto_mode = True
-            self.use_quality_mode = False
-        elif mode == "quality":
-            self.use_auto_mode = False
-            self.use_quality_mode = True
-        else:  # fast
-            self.use_auto_mode = False
-            self.use_quality_mode = False
+        self.use_auto_mode = mode == "auto"
+        self.use_quality_mode = mode == "quality"
+        self.use_smooth_mode = mode == "smooth"
         
         # 保存配置
         self.save_config()
+        self.schedule_preview()
         
         # 在日志中显示切换信息
         if hasattr(self, 'log_text'):
@@ -1347,10 +1155,18 @@ class ImageProcessorApp:
                 mode_name = "智能模式（自动选择）"
             elif mode == "quality":
                 mode_name = "高质量模式（V1.4）"
+            elif mode == "smooth":
+                mode_name = "抗锯齿模式"
             else:
                 mode_name = "快速模式（V1.5）"
             print(f"已切换到：{mode_name}")
 
+    def update_auto_threshold(self):
+        """切换自动阈值"""
+        self.auto_threshold = self.auto_threshold_var.get()
+        self.save_config()
+        self.schedule_preview()
+
     def update_compression_state(self):
         """更新压缩开关状态"""
         self.enable_compression = self.compression_var.get()
@@ -1368,6 +1184,20 @@ class ImageProcessorApp:
         status = "已启用" if self.enable_compression else "已禁用"
         print(f"压缩功能 {status}")
     
+    def update_perf_options(self):
+        """更新性能分析选项"""
+        self.enable_timing = self.timing_var.get()
+        self.save_timing_json = self.timing_json_var.get()
+        self.track_memory = self.memory_var.get()
+
+        # 保存JSON依赖于计时，勾选保存时自动开启计时
+        if self.save_timing_json and not self.enable_timing:
+            self.enable_timing = True
+            self.timing_var.set(True)
+
+        # 保存配置
+        self.save_config()
+    
     def on_quality_change(self, value):
         """当压缩质量滑块改变时更新显示"""
         quality = int(float(value))
@@ -1377,7 +1207,178 @@ class ImageProcessorApp:
         # 保存配置
         self.save_config()
 
+def parse_args(argv=None):
+    """解析命令行参数；不带 --input 时启动图形界面"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f"图片批量拼接与反色处理工具 V{__version__}（不带 --input 时启动图形界面）")
+    parser.add_argument('-i', '--input', help="输入文件夹（指定后以命令行模式运行，不启动界面）")
+    parser.add_argument('-o', '--output', help="输出文件夹（默认使用config.json中的设置）")
+    parser.add_argument('--mode', choices=['invert_concat', 'invert_only', 'concat'],
+                        help="处理模式：invert_concat=反色+拼接, invert_only=仅反色(默认), concat=仅拼接")
+    parser.add_argument('--color', help="文字颜色，16进制如 #DAA520")
+    parser.add_argument('--algorithm', choices=['auto', 'fast', 'quality', 'smooth'],
+                        help="算法模式：auto=智能, fast=快速, quality=高质量, smooth=抗锯齿")
+    parser.add_argument('--auto-threshold', action='store_true', help="快速/抗锯齿模式按每张图片的亮度直方图自动选阈值")
+    parser.add_argument('--quality', type=int, help="压缩质量(70-95)")
+    parser.add_argument('--no-compression', action='store_true', help="不启用压缩优化（质量95）")
+    parser.add_argument('--workers', help="CPU线程数：固定值如 4，或自适应范围如 2-8")
+    parser.add_argument('--timing', action='store_true', help="记录各阶段耗时并在结束时输出统计")
+    parser.add_argument('--timing-json', action='store_true', help="把耗时统计保存为JSON（自动开启 --timing）")
+    parser.add_argument('--memory', action='store_true', help="记录每张图片/每首歌的内存峰值并列出占用最高的任务")
+    parser.add_argument('--profile', action='store_true', help="采样剖析本次运行，结果保存为speedscope文件")
+    parser.add_argument('--watch', action='store_true', help="监视模式：持续处理新放入输入文件夹的页面，启动时已有的文件不处理（Ctrl+C停止）")
+    parser.add_argument('--watch-interval', type=float, default=2.0, help="监视模式下扫描输入文件夹的间隔秒数（默认2）")
+    parser.add_argument('--settle', type=float, default=5.0, help="监视模式下一首歌的页面多少秒没有变化后才处理（默认5）")
+    parser.add_argument('--serve', metavar='[HOST:]PORT', help="启动本地HTTP处理服务（如 8765 或 0.0.0.0:8765），颜色/算法/压缩参数作为默认值")
+    parser.add_argument('--cache-mb', type=int, default=256, help="服务模式的结果缓存大小（MB，默认256）")
+    parser.add_argument('--max-pending', type=int, help="服务模式同时排队的请求上限，超过返回503（默认进程数x4）")
+    parser.add_argument('--import-time', action='store_true',
+                        help="显示启动导入耗时和后台预热耗时后退出（检查启动速度回归，发现提前导入重量级模块时返回1）")
+    parser.add_argument('--config', help="配置文件路径（默认使用程序目录下的config.json）")
+    return parser.parse_args(argv)
+
+def settings_from_args(args):
+    """读取config.json作为默认设置，命令行参数覆盖对应项；参数无效时抛出ValueError"""
+    settings = load_settings(args.config)
+    settings['input_folder'] = args.input
+    if args.output:
+        settings['output_folder'] = args.output
+    if args.mode:
+        settings['process_mode'] = args.mode
+    if args.color:
+        settings['yellow_text_r'], settings['yellow_text_g'], settings['yellow_text_b'] = parse_hex_color(args.color)
+    if args.algorithm:
+        settings['use_auto_mode'] = args.algorithm == 'auto'
+        settings['use_quality_mode'] = args.algorithm == 'quality'
+        settings['use_smooth_mode'] = args.algorithm == 'smooth'
+    if args.auto_threshold:
+        settings['auto_threshold'] = True
+    if args.quality is not None:
+        settings['compression_quality'] = max(70, min(95, args.quality))
+    if args.no_compression:
+        settings['enable_compression'] = False
+    if args.workers:
+        try:
+            low, _, high = args.workers.partition('-')
+            low, high = int(low), int(high or low)
+        except ValueError:
+            raise ValueError(f"无效的线程数: {args.workers}") from None
+        settings['adaptive_workers'] = low != high
+        settings['min_workers'], settings['max_workers'] = low, high
+    if args.timing or args.timing_json:
+        settings['enable_timing'] = True
+    if args.timing_json:
+        settings['save_timing_json'] = True
+    if args.memory:
+        settings['track_memory'] = True
+    if args.profile:
+        settings['profile_run'] = True
+    return settings
+
+def run_cli(args):
+    """命令行模式：读取config.json作为默认设置，命令行参数覆盖对应项"""
+    try:
+        settings = settings_from_args(args)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    # 验证输入
+    if not Path(settings['input_folder']).is_dir():
+        print(f"错误: 输入文件夹不存在: {settings['input_folder']}")
+        return 2
+    if not settings['output_folder']:
+        print("错误: 请用 --output 指定输出文件夹")
+        return 2
+    if args.watch and Path(settings['output_folder']).resolve() == Path(settings['input_folder']).resolve():
+        print("错误: 监视模式下输出文件夹不能与输入文件夹相同（输出文件会被当作新文件反复处理）")
+        return 2
+    Path(settings['output_folder']).mkdir(parents=True, exist_ok=True)
+
+    last_percent = None
+    def progress(value, maximum, percent=None, stats=None):
+        nonlocal last_percent
+        if percent is None:
+            percent = int((value / maximum) * 100) if maximum > 0 else 100
+        # 只在百分比变化时输出，避免刷屏
+        if percent != last_percent:
+            last_percent = percent
+            if stats:
+                print(f"进度: {percent}% | {format_progress_stats(stats)}")
+            else:
+                print(f"进度: {percent}%")
+
+    # Ctrl+C：第一次取消（已开始的任务完成后退出，不留半成品），第二次立即退出
+    control = picstitcher.BatchControl()
+    def on_interrupt(signum, frame):
+        if control.cancelled:
+            raise KeyboardInterrupt
+        print("⏹ 正在取消，等待已开始的任务完成...（再按一次Ctrl+C立即退出）")
+        control.cancel()
+    previous_handler = signal.signal(signal.SIGINT, on_interrupt)
+
+    try:
+        if args.watch:
+            processor = picstitcher.BatchProcessor(settings, log=print, progress=progress, control=control, keep_pool=True)
+            picstitcher.FolderWatcher(processor, max(args.watch_interval, 0.1), max(args.settle, 0.0)).run()
+            return 0
+        processor = picstitcher.BatchProcessor(settings, log=print, progress=progress, control=control)
+        if processor.run():
+            print("处理完成!")
+            return 0
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+    return 130 if control.cancelled else 1
+
+def run_server(args):
+    """服务模式：启动本地HTTP处理服务，直到Ctrl+C"""
+    try:
+        settings = settings_from_args(args)
+        host, _, port = args.serve.rpartition(':')
+        port = int(port)
+    except ValueError as e:
+        print(e)
+        return 2
+    service = picstitcher.ProcessingService(settings, workers=settings['max_workers'] or None,
+                                            max_pending=args.max_pending,
+                                            cache_bytes=max(args.cache_mb, 0) * 1024 * 1024)
+    # Ctrl+C和SIGTERM都正常停止服务（后台启动时SIGINT可能被继承为忽略）
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    service.serve(host or '127.0.0.1', port)
+    return 0
+
+def report_import_time():
+    """启动耗时统计：显示窗口前的导入耗时、是否提前导入了重量级模块，以及后台预热各步骤的耗时"""
+    print(f"启动导入（显示窗口前）: {(_IMPORT_END - _IMPORT_START) * 1000:.1f} ms")
+    loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+    if loaded:
+        print(f"⚠ 启动时已导入: {', '.join(loaded)}（应延迟到后台预热或第一次处理时）")
+    else:
+        print(f"✓ 启动时未导入: {', '.join(DEFERRED_MODULES)}")
+
+    timings = {}
+    picstitcher.warm_up(timings)
+    print(f"后台预热（窗口显示后）: {sum(timings.values()) * 1000:.1f} ms")
+    for name, seconds in timings.items():
+        print(f"  {seconds * 1000:>8.1f} ms  {name}")
+    return 1 if loaded else 0
+
 if __name__ == "__main__":
+    if getattr(sys, 'frozen', False):
+        # 打包后的EXE中，服务模式的进程池子进程需要
+        import multiprocessing
+        multiprocessing.freeze_support()
+    cli_args = parse_args()
+    if cli_args.import_time:
+        sys.exit(report_import_time())
+    if cli_args.serve:
+        sys.exit(run_server(cli_args))
+    if cli_args.input:
+        sys.exit(run_cli(cli_args))
+
     root = tk.Tk()
 
     # 尝试设置按钮样式
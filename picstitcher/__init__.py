@@ -0,0 +1,78 @@
+"""PicStitcher 处理核心（不依赖tkinter，可被其他程序直接导入）
+
+    import picstitcher
+    picstitcher.recolor_file('第1首 歌名1.png', 'out.jpg', color=(218, 165, 32))
+    jpeg = picstitcher.stitch_bytes([page1, page2], invert=True)
+    rgb = picstitcher.recolor_array(array, algorithm='fast')
+
+图形界面和命令行（main.py）也只通过这里的接口调用处理逻辑。
+
+子模块按需导入：import picstitcher 本身几乎没有开销，第一次用到某个接口时才导入对应模块
+（以及NumPy/Pillow），界面可以先显示窗口，再用 warm_up() 在后台线程提前导入。
+"""
+import importlib
+import time
+
+# 版本信息（必须在导入子模块之前定义，子模块会引用它）
+__version__ = "1.6"
+
+# 对外接口 -> 所在子模块
+_EXPORTS = {
+    # 路径/字节/数组接口
+    'ALGORITHMS': 'api', 'DEFAULT_TEXT_COLOR': 'api', 'recolor_image': 'api', 'stitch_images': 'api',
+    'recolor_file': 'api', 'stitch_files': 'api', 'recolor_bytes': 'api', 'stitch_bytes': 'api',
+    'recolor_array': 'api', 'stitch_arrays': 'api',
+    # 底层函数
+    'extract_info': 'naming', 'IMAGE_EXTENSIONS': 'naming', 'vertical_concat_images': 'stitch',
+    'detect_background_type': 'recolor', 'apply_yellow_text_effect': 'recolor',
+    'apply_yellow_text_effect_fast': 'recolor', 'apply_yellow_text_effect_quality': 'recolor',
+    'apply_yellow_text_effect_smooth': 'recolor', 'apply_yellow_text_effect_bands': 'recolor',
+    'read_file_bytes': 'imageio', 'decode_image_bytes': 'imageio', 'write_file_bytes': 'imageio',
+    'encode_image_with_compression': 'imageio', 'save_image_with_compression': 'imageio',
+    # 批处理、监视模式和HTTP服务
+    'DEFAULT_SETTINGS': 'settings', 'load_settings': 'settings', 'BatchProcessor': 'batch',
+    'BatchControl': 'batch', 'FolderWatcher': 'batch', 'ProcessingService': 'service',
+    # 颜色预览
+    'RecolorPreview': 'preview',
+}
+
+__all__ = ['__version__', 'warm_up'] + list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value  # 之后直接命中，不再经过 __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+def warm_up(timings=None):
+    """提前导入NumPy、Pillow和处理模块，并跑一次极小的变色和编码（加载JPEG编码器等）
+
+    界面显示后在后台线程调用，第一次处理时不用再等这些导入。
+
+    Args:
+        timings: 可选dict，写入各步骤耗时（秒），用于启动耗时统计
+    """
+    steps = (
+        ('numpy', lambda: importlib.import_module('numpy')),
+        ('PIL', lambda: importlib.import_module('PIL.Image')),
+        ('picstitcher', lambda: [importlib.import_module(f'.{m}', __name__) for m in ('api', 'batch', 'preview')]),
+        ('首次变色+编码', _first_recolor),
+    )
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        if timings is not None:
+            timings[name] = time.perf_counter() - start
+
+def _first_recolor():
+    from PIL import Image
+    from .api import recolor_bytes
+    from .imageio import encode_image_with_compression
+    sample = encode_image_with_compression(Image.new('RGB', (16, 16)))
+    for algorithm in ('fast', 'quality'):
+        recolor_bytes(sample, algorithm=algorithm)
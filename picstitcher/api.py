@@ -0,0 +1,90 @@
+"""稳定的对外接口：路径进/路径出、字节进/字节出、数组进/数组出三种形式
+
+嵌入PicStitcher只需要 import picstitcher（只导入NumPy和Pillow，不导入tkinter和界面代码）。
+变色结果与批处理一致：输出用于JPEG，不保留透明通道。
+
+参数:
+    color: 文字颜色 (r, g, b)，默认与config.json的默认值相同（秋麒麟色）
+    algorithm: 'auto'=智能（带透明通道用高质量模式，其他用快速模式）, 'fast'=快速, 'quality'=高质量,
+               'smooth'=抗锯齿（文字边缘按亮度平滑过渡）
+    auto_threshold: True时快速/抗锯齿模式按每张图片的亮度直方图自动选阈值（褪色、偏暗的扫描件）
+    enable_compression / compression_quality: 与config.json中的压缩设置相同
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+from .imageio import decode_image_bytes, encode_image_with_compression, read_file_bytes, write_file_bytes
+from .recolor import apply_yellow_text_effect, histogram_levels, luminance_histogram
+from .settings import DEFAULT_SETTINGS
+from .stitch import vertical_concat_images
+
+DEFAULT_TEXT_COLOR = (DEFAULT_SETTINGS['yellow_text_r'], DEFAULT_SETTINGS['yellow_text_g'],
+                      DEFAULT_SETTINGS['yellow_text_b'])
+ALGORITHMS = ('auto', 'fast', 'quality', 'smooth')
+
+def recolor_image(image, color=DEFAULT_TEXT_COLOR, algorithm='auto', auto_threshold=False, levels=None):
+    """PIL.Image进/PIL.Image出：按颜色和算法模式变色
+
+    levels: 可选 (is_dark_bg, threshold)，不逐图检测背景和阈值（见 picstitcher.recolor.histogram_levels）
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"无效的算法模式: {algorithm}")
+    return apply_yellow_text_effect(image, *color, use_quality_mode=algorithm == 'quality',
+                                    auto_mode=algorithm == 'auto', keep_alpha=False,
+                                    use_smooth_mode=algorithm == 'smooth', auto_threshold=auto_threshold,
+                                    levels=levels)
+
+def stitch_images(images, invert=False, color=DEFAULT_TEXT_COLOR, algorithm='auto', auto_threshold=False):
+    """竖向拼接（路径/文件对象/PIL.Image均可），invert=True时拼接后再变色（与"反色+拼接"模式一致）
+
+    变色时背景类型和阈值由各页亮度直方图合并后统一决定（拼接时顺便统计，补的白边不参与判断）。
+    """
+    histograms = {}
+    on_page = (lambda index, page: histograms.__setitem__(index, luminance_histogram(page))) if invert else None
+    result = vertical_concat_images(images, on_page=on_page)
+    if invert:
+        levels = histogram_levels(sum(histograms.values()), auto_threshold)
+        result = recolor_image(result, color, algorithm, auto_threshold, levels)
+    return result
+
+# ---------------------------------------------------------------- 路径进/路径出
+
+def recolor_file(input_path, output_path, color=DEFAULT_TEXT_COLOR, algorithm='auto',
+                 enable_compression=True, compression_quality=82, auto_threshold=False):
+    """读取一张图片，变色后保存为JPEG（先写临时文件再改名，不会留下半成品）"""
+    image = recolor_image(decode_image_bytes(read_file_bytes(input_path)), color, algorithm, auto_threshold)
+    write_file_bytes(output_path, encode_image_with_compression(image, enable_compression, compression_quality))
+
+def stitch_files(input_paths, output_path, invert=False, color=DEFAULT_TEXT_COLOR, algorithm='auto',
+                 enable_compression=True, compression_quality=82, auto_threshold=False):
+    """按顺序竖向拼接多张图片并保存为JPEG，invert=True时拼接后再变色"""
+    image = stitch_images([str(path) for path in input_paths], invert, color, algorithm, auto_threshold)
+    write_file_bytes(output_path, encode_image_with_compression(image, enable_compression, compression_quality))
+
+# ---------------------------------------------------------------- 字节进/字节出
+
+def recolor_bytes(data, color=DEFAULT_TEXT_COLOR, algorithm='auto', enable_compression=True, compression_quality=82,
+                  auto_threshold=False):
+    """图片文件字节 → 变色后的JPEG字节"""
+    image = recolor_image(decode_image_bytes(data), color, algorithm, auto_threshold)
+    return encode_image_with_compression(image, enable_compression, compression_quality)
+
+def stitch_bytes(pages, invert=False, color=DEFAULT_TEXT_COLOR, algorithm='auto',
+                 enable_compression=True, compression_quality=82, auto_threshold=False):
+    """各页图片文件字节（按顺序） → 拼接后的JPEG字节，invert=True时拼接后再变色"""
+    image = stitch_images([io.BytesIO(page) for page in pages], invert, color, algorithm, auto_threshold)
+    return encode_image_with_compression(image, enable_compression, compression_quality)
+
+# ---------------------------------------------------------------- 数组进/数组出
+
+def recolor_array(array, color=DEFAULT_TEXT_COLOR, algorithm='auto', auto_threshold=False):
+    """uint8数组（HxW灰度、HxWx3 RGB或HxWx4 RGBA） → 变色后的HxWx3 RGB数组"""
+    image = Image.fromarray(np.ascontiguousarray(array, dtype=np.uint8))
+    return np.asarray(recolor_image(image, color, algorithm, auto_threshold))
+
+def stitch_arrays(arrays, invert=False, color=DEFAULT_TEXT_COLOR, algorithm='auto', auto_threshold=False):
+    """各页uint8数组（按顺序） → 拼接后的HxWx3 RGB数组，宽度不同的页面居中，两侧补白"""
+    images = [Image.fromarray(np.ascontiguousarray(array, dtype=np.uint8)) for array in arrays]
+    return np.asarray(stitch_images(images, invert, color, algorithm, auto_threshold))
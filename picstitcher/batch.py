@@ -0,0 +1,865 @@
+"""批处理：处理计划、自适应并发、取消/暂停、批处理核心和监视模式"""
+import io
+import itertools
+import json
+import mmap
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import closing, nullcontext
+from pathlib import Path
+
+from PIL import Image
+
+from . import __version__
+from .imageio import (
+    AsyncWriter, decode_image_bytes, encode_image_with_compression,
+    FilePrefetcher, probe_image_sizes, write_file_bytes,
+)
+from .naming import IMAGE_EXTENSIONS, extract_info
+from .perf import MemoryTracker, SamplingProfiler, StageTimer, ThroughputMeter
+from .recolor import apply_yellow_text_effect, apply_yellow_text_effect_bands, histogram_levels, luminance_histogram
+from .settings import DEFAULT_IO_WORKERS, DEFAULT_SETTINGS
+from .stitch import concat_recolored_pages, stitched_size, vertical_concat_images
+
+# 反色+拼接时统计各页亮度直方图的线程数（每页只需一次C里的转换和统计，与下一页的解码并行即可）
+HISTOGRAM_WORKERS = 2
+
+# 每像素的估算峰值内存（字节）：画布/输入图 + 变色时的NumPy数组和中间结果，按2000x1500实测取整
+# （高质量模式按输出JPEG、不保留透明通道的路径计算）
+ESTIMATED_BYTES_PER_PIXEL = {'fast': 18, 'quality': 27}
+
+class BatchPlan:
+    """处理计划：并行读取所有输入文件的文件头（不解码像素），在开始处理前得到
+    每个任务的画布尺寸、像素数（用于排序和剩余时间）、估算内存，并找出无法识别的文件。
+
+    jobs为 [(任务名, [路径, ...])]：单文件任务只有一个路径，歌曲任务为按页码排好的各页。
+    计划中的任务只保留能识别的页面；所有页面都无法识别的任务被去掉。
+    """
+
+    def __init__(self, jobs, io_workers=DEFAULT_IO_WORKERS):
+        jobs = list(jobs)
+        sizes = iter(probe_image_sizes([path for _, paths in jobs for path in paths], io_workers))
+        self.jobs = []      # [{'name', 'paths', 'size', 'cost'}]
+        self.problems = []  # 无法识别的文件路径
+        self.pages = 0
+        for name, paths in jobs:
+            valid, valid_sizes = [], []
+            for path in paths:
+                size = next(sizes)
+                if size is None:
+                    self.problems.append(path)
+                else:
+                    valid.append(path)
+                    valid_sizes.append(size)
+            if valid:
+                size = stitched_size(valid_sizes)
+                self.jobs.append({'name': name, 'paths': valid, 'size': size, 'cost': size[0] * size[1]})
+                self.pages += len(valid)
+
+    def sort_largest_first(self):
+        """按像素数从大到小排序（稳定排序，相同大小保持原顺序）"""
+        self.jobs.sort(key=lambda job: -job['cost'])
+
+    def format_summary(self, quality=False, label=None, max_problems=20):
+        """返回用于日志显示的多行文本：任务数、总像素、最大画布和估算内存、无法识别的文件
+
+        label: 可选，把任务名转换为显示名称的函数
+        """
+        total_pixels = sum(job['cost'] for job in self.jobs)
+        lines = [f"📋 处理计划: {len(self.jobs)} 个任务（{self.pages} 张图片），共 {total_pixels / 1e6:.1f} MP"]
+        if self.jobs:
+            largest = max(self.jobs, key=lambda job: job['cost'])
+            per_pixel = ESTIMATED_BYTES_PER_PIXEL['quality' if quality else 'fast']
+            width, height = largest['size']
+            name = label(largest['name']) if label else largest['name']
+            lines.append(f"   最大画布 {width}x{height}（{name}），单个任务预计峰值内存约 "
+                         f"{largest['cost'] * per_pixel / 1024 / 1024:.0f} MB")
+        if self.problems:
+            lines.append(f"⚠ 发现 {len(self.problems)} 个无法识别或不支持的文件，已跳过:")
+            for path in self.problems[:max_problems]:
+                lines.append(f"   ⚠ {Path(path).name}")
+            if len(self.problems) > max_problems:
+                lines.append(f"   ⚠ ……另有 {len(self.problems) - max_problems} 个（完整列表见日志文件）")
+        return lines
+
+class AdaptiveWorkers:
+    """自适应CPU并发数：按实测吞吐量在 [min_workers, max_workers] 范围内调整并发线程数
+
+    从 start 个线程开始试探，每完成一个测量周期（至少 period 个任务、0.25秒）计算一次
+    像素吞吐量（像素/秒）和每线程CPU利用率（进程CPU时间 / 墙钟时间 / 并发数）：
+        - 利用率高（线程大部分时间在算，而不是在等GIL或I/O）且更多线程还没试过 → 加一个线程
+        - 利用率低且更少线程还没试过 → 减一个线程
+        - 否则在当前值和相邻值中选实测吞吐量最高的
+    每10个周期清空相邻并发数的测量值，重新试探，以适应解码/编码比重不同的文件。
+    min_workers == max_workers 时即固定并发数。job_done() 可在工作线程中调用。
+    """
+
+    BUSY_UTILIZATION = 0.5  # 每线程CPU利用率高于此值时才尝试增加线程
+
+    def __init__(self, min_workers, max_workers, start=None):
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        if start is None:
+            start = min(2, self.max_workers)
+        self.workers = min(max(start, self.min_workers), self.max_workers)
+        self.rates = {}    # 并发数 -> 实测吞吐量（像素/秒，指数平均）
+        self.history = []  # (并发数, 吞吐量, CPU利用率)，用于结束时的日志
+        self._periods = 0
+        self._lock = threading.Lock()
+        self._begin_period()
+
+    @property
+    def fixed(self):
+        return self.min_workers == self.max_workers
+
+    def _begin_period(self):
+        self._jobs = 0
+        self._pixels = 0
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def job_done(self, pixels):
+        """记录一个完成的CPU任务，测量周期结束时调整并发数"""
+        if self.fixed:
+            return
+        with self._lock:
+            self._jobs += 1
+            self._pixels += pixels
+            wall = time.perf_counter() - self._wall
+            if self._jobs < max(4, self.workers * 2) or wall < 0.25:
+                return
+            rate = self._pixels / wall
+            utilization = (time.process_time() - self._cpu) / wall / self.workers
+            self.history.append((self.workers, rate, utilization))
+            self._adjust(rate, utilization)
+            self._begin_period()
+
+    def _adjust(self, rate, utilization):
+        current = self.workers
+        old = self.rates.get(current)
+        self.rates[current] = rate if old is None else (old + rate) / 2
+
+        self._periods += 1
+        if self._periods % 10 == 0:
+            # 定期重新试探：文件类型变化后，之前测得的相邻并发数吞吐量可能已不准确
+            self.rates = {current: self.rates[current]}
+
+        up, down = current + 1, current - 1
+        if up <= self.max_workers and up not in self.rates and utilization >= self.BUSY_UTILIZATION:
+            self.workers = up
+        elif down >= self.min_workers and down not in self.rates and utilization < self.BUSY_UTILIZATION:
+            self.workers = down
+        else:
+            candidates = [w for w in (down, current, up) if w in self.rates]
+            self.workers = max(candidates, key=self.rates.get)
+
+    def format_summary(self):
+        """返回结束时的日志文字：最终并发数和各并发数的实测吞吐量"""
+        if self.fixed:
+            return f"⚙ 固定并发: {self.workers}线程"
+        measured = ', '.join(f"{w}线程 {rate / 1e6:.1f} MP/s" for w, rate in sorted(self.rates.items()))
+        return f"⚙ 自适应并发: 最终{self.workers}线程（范围{self.min_workers}-{self.max_workers}，共调整{len(self.history)}个周期；实测: {measured or '任务太少，未测量'}）"
+
+class BatchControl:
+    """批处理的取消/暂停控制，可在任意线程（界面线程、信号处理函数）调用
+
+    处理线程在提交每个新任务前调用 checkpoint()：暂停时在此等待，取消后返回False。
+    已经开始的任务会正常完成并写出（写盘是原子的），之后不再提交新任务。
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # 唤醒暂停中的处理线程，让它看到取消
+
+    def pause(self):
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def checkpoint(self):
+        """暂停时等待恢复；返回False表示已取消，不应再提交新任务"""
+        self._running.wait()
+        return not self.cancelled
+
+    def sleep(self, seconds):
+        """等待seconds秒（监视模式的轮询间隔），期间被取消时立即返回；返回False表示已取消"""
+        return not self._cancelled.wait(seconds)
+
+class BatchProcessor:
+    """批量处理核心（不依赖Tk），GUI和命令行共用
+
+    处理设置使用与config.json相同的键（另加 process_mode），未提供的键取 DEFAULT_SETTINGS 中的默认值。
+    处理过程通过回调向外报告：
+        log(message)                          日志
+        progress(value, maximum, percent, stats)
+                                              进度（percent可为None，stats为吞吐量/剩余时间，见 ThroughputMeter.snapshot）
+        status(text)                          状态文字
+    传入 BatchControl 可在运行中取消或暂停（见 BatchControl）。
+    """
+
+    def __init__(self, settings, log=print, progress=None, status=None, control=None, keep_pool=False):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings)
+        self.log = log
+        self._progress = progress
+        self._status = status
+        self.control = control if control is not None else BatchControl()
+        self.progress_maximum = 0
+        self.meter = ThroughputMeter()
+        # keep_pool=True时各线程池和自适应并发数在多次run()之间保留（监视模式下保持预热），用完调用close()
+        self.keep_pool = keep_pool
+        self._pools = {}  # 线程池名 -> (线程池, 线程数)
+        self._band_pool = None
+        self._band_lock = threading.Lock()
+        self.last_workers = None
+
+    def cpu_executor(self, max_workers, name='cpu'):
+        """返回线程池的上下文管理器：keep_pool时按name复用同一个线程池（线程空闲时保留，下次无需重新创建）
+
+        name区分用途：'cpu'=仅反色的文件任务，'pages'=逐页变色，'histogram'=逐页统计直方图
+        """
+        if not self.keep_pool:
+            return ThreadPoolExecutor(max_workers=max_workers)
+        pool, size = self._pools.get(name, (None, 0))
+        if pool is None or size < max_workers:
+            if pool is not None:
+                pool.shutdown(wait=True)
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+            self._pools[name] = (pool, max_workers)
+        return nullcontext(pool)
+
+    def band_executor(self):
+        """分块变色用的线程池（第一次用到时创建）
+
+        与处理文件的CPU线程池分开：文件任务在里面等待分块结果时不会占满同一个池而互相等待。
+        """
+        with self._band_lock:
+            if self._band_pool is None:
+                self._band_pool = ThreadPoolExecutor(max_workers=self.settings['max_workers'] or os.cpu_count() or 4)
+            return self._band_pool
+
+    def close_band_pool(self):
+        with self._band_lock:
+            if self._band_pool is not None:
+                self._band_pool.shutdown(wait=True)
+                self._band_pool = None
+
+    def close(self):
+        """关闭保留的线程池和分块变色线程池"""
+        for pool, _ in self._pools.values():
+            pool.shutdown(wait=True)
+        self._pools.clear()
+        self.close_band_pool()
+
+    def update_progress(self, value, maximum, percent=None):
+        if maximum > 0:
+            self.progress_maximum = maximum
+        if self._progress:
+            self._progress(value, maximum, percent, self.meter.snapshot(value, maximum))
+
+    def set_status(self, text):
+        if self._status:
+            self._status(text)
+
+    def recolor(self, image, levels=None):
+        """按当前颜色和算法模式变色（输出都是JPEG，不需要保留透明通道）
+
+        levels: 可选 (is_dark_bg, threshold)，整首歌统一决定的背景类型和阈值（见 histogram_levels）
+
+        超过 band_min_pixels 的图片按行分块、在分块线程池中并行变色（结果相同）：
+        输入文件少于5个时逐个处理、或一张超大的拼接图，都不会只用一个核。
+        """
+        s = self.settings
+        color = (s['yellow_text_r'], s['yellow_text_g'], s['yellow_text_b'])
+        workers = s['max_workers'] or os.cpu_count() or 4
+        if s['band_min_pixels'] and workers > 1 and image.width * image.height >= s['band_min_pixels']:
+            return apply_yellow_text_effect_bands(image, *color, use_quality_mode=s['use_quality_mode'],
+                                                  auto_mode=s['use_auto_mode'], use_smooth_mode=s['use_smooth_mode'],
+                                                  auto_threshold=s['auto_threshold'], levels=levels,
+                                                  map_bands=self.band_executor().map, bands=workers * 2)
+        return apply_yellow_text_effect(image, *color,
+                                        use_quality_mode=s['use_quality_mode'], auto_mode=s['use_auto_mode'],
+                                        keep_alpha=False, use_smooth_mode=s['use_smooth_mode'],
+                                        auto_threshold=s['auto_threshold'], levels=levels)
+
+    def encode_image(self, image):
+        """根据压缩设置把图片编码为JPEG字节"""
+        return encode_image_with_compression(image, self.settings['enable_compression'], self.settings['compression_quality'])
+
+    def run(self, files=None):
+        """执行一次批处理，成功返回True，出错或被取消返回False
+
+        Args:
+            files: 只处理输入文件夹中的这些文件名（监视模式使用），None表示处理全部图片
+        """
+        profiler = SamplingProfiler() if self.settings['profile_run'] else None
+        try:
+            if profiler:
+                profiler.start()
+            try:
+                self._run(files)
+            finally:
+                if profiler:
+                    profiler.stop()
+                    self.report_profile(profiler)
+
+            if self.control.cancelled:
+                self.log("⏹ 处理已取消：已开始的任务已完成并保存，其余文件未处理")
+                self.set_status("已取消")
+                return False
+
+            # 确保进度条显示100%完成
+            if self.progress_maximum > 0:  # 避免除以零错误
+                self.update_progress(self.progress_maximum, self.progress_maximum, 100)
+            return True
+
+        except Exception as e:
+            self.set_status(f"处理出错: {str(e)}")
+            self.log(f"错误详情: {str(e)}")
+            return False
+
+    def _run(self, files=None):
+        s = self.settings
+        self.meter = ThroughputMeter()
+
+        # 获取所有图片文件
+        input_path = Path(s['input_folder'])
+        output_folder = Path(s['output_folder'])
+        if files is not None:
+            image_files = list(files)
+        else:
+            image_files = [f.name for f in input_path.iterdir()
+                          if f.is_file() and f.suffix.lower() in IMAGE_EXTENSIONS]
+
+        # 分阶段计时和内存峰值跟踪（未启用时几乎没有开销）
+        timer = StageTimer(s['enable_timing'])
+        memory = MemoryTracker(s['track_memory'])
+        memory.start()
+        try:
+            self._process(image_files, input_path, output_folder, timer, memory)
+        finally:
+            memory.stop()
+            if not self.keep_pool:
+                self.close_band_pool()
+
+        # 输出性能统计
+        if timer.enabled:
+            self.report_timing(timer, memory)
+        if memory.enabled:
+            self.report_memory(memory)
+
+    def _process(self, image_files, input_path, output_folder, timer, memory):
+        s = self.settings
+        mode = s['process_mode']
+        only_invert = mode == 'invert_only'
+        invert = mode == 'invert_concat'
+        only_concat = mode == 'concat'
+        io_workers, prefetch_ahead, use_mmap = s['io_workers'], s['prefetch_ahead'], s['use_mmap']
+
+        if only_invert:
+            # 仅执行反色处理 - 使用多线程加速
+            if s['plan_inputs']:
+                # 大图先处理（只在多线程时有用：大图最后才开始时，其他线程只能空等它完成）
+                plan = self.plan_jobs([(f, [input_path / f]) for f in image_files], timer,
+                                      largest_first=s['largest_first'])
+                image_files = [job['name'] for job in plan.jobs]
+            total_files = len(image_files)
+            self.update_progress(0, total_files, 0)
+
+            # 文件数量>=5（自适应并发时>=2）使用多线程并行处理
+            if total_files >= (2 if s['adaptive_workers'] else 5):
+                if s['adaptive_workers']:
+                    max_workers = min(s['max_workers'] or os.cpu_count() or 4, total_files)
+                    # 监视模式下从上一批最终的并发数开始，不必重新试探
+                    workers = AdaptiveWorkers(s['min_workers'], max_workers, start=self.last_workers)
+                    self.log(f"🚀 启用自适应多线程模式（初始{workers.workers}线程，范围{workers.min_workers}-{workers.max_workers}，"
+                             f"I/O {io_workers}线程，预读{prefetch_ahead}个文件）...")
+                else:
+                    cpu_workers = min(s['max_workers'] or 4, total_files)
+                    workers = AdaptiveWorkers(cpu_workers, cpu_workers)
+                    self.log(f"🚀 启用多线程加速模式（{cpu_workers}线程，I/O {io_workers}线程，预读{prefetch_ahead}个文件）...")
+
+                def process_single_file(img_file, data):
+                    """处理单个文件（只做解码/变色/编码，读写由I/O线程完成）"""
+                    try:
+                        with memory.job(img_file) as job:
+                            with timer.stage('decode'):
+                                img = decode_image_bytes(data)
+                            del data  # 原始字节已无用，尽早释放
+                            job.set_size(img.size)
+                            with timer.stage('recolor'):
+                                inverted_img = self.recolor(img)
+                            # 使用压缩设置编码
+                            with timer.stage('encode'):
+                                output_data = self.encode_image(inverted_img)
+                        workers.job_done(img.width * img.height)
+                        return True, img_file, output_data, img.width * img.height
+                    except Exception as e:
+                        return False, f"{img_file}: {str(e)}", None, 0
+
+                completed = 0
+                def finish(info, success, pixels=0, nbytes=0):
+                    nonlocal completed
+                    completed += 1
+                    self.meter.job_done(pixels)
+                    if success:
+                        timer.count(images=1)
+                        self.meter.add_written(nbytes)
+                        self.log(f"✓ 已反色并保存: {info}")
+                    else:
+                        self.log(f"✗ 处理出错: {info}")
+                    self.update_progress(completed, total_files)
+
+                # 预读(I/O线程) → 解码/变色/编码(CPU线程池) → 写盘(I/O线程)
+                prefetcher = FilePrefetcher([input_path / f for f in image_files], prefetch_ahead, io_workers, use_mmap, timer)
+                processing = deque()  # CPU任务（按提交顺序）
+                writing = deque()     # 写盘任务（按提交顺序）
+
+                def drain_writes(block):
+                    while writing and (block or writing[0][1].done()):
+                        img_file, write_future, pixels, nbytes = writing.popleft()
+                        try:
+                            write_future.result()
+                            finish(img_file, True, pixels, nbytes)
+                        except Exception as e:
+                            finish(f"{img_file}: {str(e)}", False)
+
+                def drain_oldest_job():
+                    future = processing.popleft()
+                    if future.cancelled():
+                        return
+                    success, info, data, pixels = future.result()
+                    if success:
+                        writing.append((info, writer.write(output_folder / info, data), pixels, len(data)))
+                    else:
+                        finish(info, False)
+                    drain_writes(block=False)
+
+                def wait_for_slot():
+                    """等到正在运行的CPU任务少于当前并发数（已完成的任务按提交顺序交给写盘）"""
+                    while True:
+                        while processing and processing[0].done():
+                            drain_oldest_job()
+                        if len(processing) >= workers.max_workers * 4:
+                            # 最早的任务太慢，后面完成的结果在排队：先等它，避免结果在内存中堆积
+                            drain_oldest_job()
+                            continue
+                        running = [future for future in processing if not future.done()]
+                        if len(running) < workers.workers:
+                            return
+                        wait(running, return_when=FIRST_COMPLETED)
+
+                with self.cpu_executor(workers.max_workers) as executor, \
+                        AsyncWriter(io_workers, prefetch_ahead, timer) as writer, \
+                        closing(iter(prefetcher)) as prefetched:
+                    for path, data, error in prefetched:
+                        if self.control.paused:
+                            # 暂停：先把已提交任务的结果交给写盘并更新进度，不让编码好的结果在内存里等到恢复
+                            while processing:
+                                drain_oldest_job()
+                            drain_writes(block=True)
+                        if not self.control.checkpoint():
+                            # 取消：不再提交新任务，还没开始的CPU任务也一并丢弃
+                            for future in processing:
+                                future.cancel()
+                            break
+                        if error is not None:
+                            finish(f"{path.name}: {str(error)}", False)
+                            continue
+                        self.meter.add_read(len(data))
+                        # 限制在途CPU任务数（按自适应并发数），也避免预读的字节在任务队列里堆积
+                        wait_for_slot()
+                        processing.append(executor.submit(process_single_file, path.name, data))
+                    while processing:
+                        drain_oldest_job()
+                    drain_writes(block=True)
+                self.log(workers.format_summary())
+                self.last_workers = workers.workers
+            else:
+                # 文件少，单线程处理
+                for i, img_file in enumerate(image_files):
+                    if not self.control.checkpoint():
+                        break
+                    input_img_path = input_path / img_file
+                    output_img_path = output_folder / img_file
+                    self.set_status(f"正在处理: {img_file}")
+
+                    pixels = 0
+                    try:
+                        with memory.job(img_file) as job:
+                            # 单线程模式下读取和解码一起计入decode
+                            with timer.stage('decode'):
+                                img = Image.open(input_img_path)
+                                img.load()
+                            job.set_size(img.size)
+                            with timer.stage('recolor'):
+                                inverted_img = self.recolor(img)
+                            # 使用压缩设置保存
+                            with timer.stage('encode'):
+                                output_data = self.encode_image(inverted_img)
+                        with timer.stage('write'):
+                            write_file_bytes(output_img_path, output_data)
+                        bytes_in = input_img_path.stat().st_size
+                        timer.count(images=1, bytes_in=bytes_in, bytes_out=len(output_data))
+                        self.meter.add_read(bytes_in)
+                        self.meter.add_written(len(output_data))
+                        pixels = img.width * img.height
+                        self.log(f"已反色并保存: {img_file}")
+                    except Exception as e:
+                        self.log(f"处理 {img_file} 时出错: {str(e)}")
+
+                    self.meter.job_done(pixels)
+                    self.update_progress(i + 1, total_files)
+        else:
+            # 按歌名分组
+            song_groups = {}
+            for img_file in image_files:
+                info = extract_info(img_file)
+                if info:
+                    song_number, song_name, page_number = info
+                    key = f"{song_number}_{song_name}"
+                    if key not in song_groups:
+                        song_groups[key] = []
+                    song_groups[key].append((page_number, input_path / img_file))
+
+            # 设置进度条
+            total_songs = len(song_groups)
+            # 避免除以零错误
+            if total_songs == 0:
+                self.log("没有找到可处理的歌曲，请检查文件命名格式")
+                self.update_progress(1, 1, 100)  # 直接设置为完成状态
+            else:
+                self.update_progress(0, total_songs, 0)
+
+            # 按页码排序
+            for images in song_groups.values():
+                images.sort(key=lambda x: x[0])
+
+            # 处理计划：无法识别的页面在开始前统一报告并跳过（歌曲仍按原页数判断是否拼接，与原先跳过坏页的结果一致）
+            skipped = set()
+            if s['plan_inputs'] and song_groups:
+                plan = self.plan_jobs([(key, [img[1] for img in images]) for key, images in song_groups.items()], timer,
+                                      label=lambda key: "第{}首 {}".format(*key.split('_', 1)))
+                skipped = set(plan.problems)
+                song_groups = {job['name']: song_groups[job['name']] for job in plan.jobs}
+                if len(song_groups) != total_songs:
+                    total_songs = len(song_groups)
+                    self.update_progress(0, total_songs, 0)
+
+            # 反色+拼接：每页解码后在线程池中统计亮度直方图（与下一页的解码并行），
+            # 合并后整首歌只决定一次背景类型和阈值，不再对整张画布采样
+            group_levels = invert and s['group_levels']
+            # 逐页变色：各页的解码和变色在CPU线程池中并行，变色后再拼接（一首歌内部也能用满多核）
+            recolor_pages = group_levels and s['recolor_pages']
+            if recolor_pages:
+                page_executor = self.cpu_executor(s['max_workers'] or os.cpu_count() or 4, 'pages')
+            elif group_levels:
+                page_executor = self.cpu_executor(HISTOGRAM_WORKERS, 'histogram')
+            else:
+                page_executor = nullcontext()
+            pending_writes = deque()
+
+            def page_histogram(page):
+                with timer.stage('histogram'):
+                    return luminance_histogram(page)
+
+            def recolor_page(page, levels):
+                with timer.stage('recolor'):
+                    return self.recolor(page, levels)
+
+            def drain_writes(block):
+                while pending_writes and (block or pending_writes[0][1].done()):
+                    log_msg, write_future, nbytes = pending_writes.popleft()
+                    try:
+                        write_future.result()
+                        timer.count(images=1)
+                        self.meter.add_written(nbytes)
+                        self.log(log_msg)
+                    except Exception as e:
+                        self.log(f"保存图片出错: {str(e)}")
+
+            # 后台预读所有歌曲的页面字节，读取下一首歌时不再等待网络盘
+            prefetcher = FilePrefetcher(
+                [img[1] for images in song_groups.values() for img in images if img[1] not in skipped],
+                prefetch_ahead, io_workers, use_mmap, timer)
+            # 出错时也会关闭页面线程池、停止预读，并等已提交的写盘任务完成
+            with AsyncWriter(io_workers, prefetch_ahead, timer) as writer, \
+                    closing(iter(prefetcher)) as prefetched_pages, \
+                    page_executor as page_pool:
+                # 处理每个歌曲组
+                processed_count = 0
+                for key, images in song_groups.items():
+                    if not self.control.checkpoint():
+                        # 取消：停止预读，已提交的写盘任务在下面等待完成
+                        prefetched_pages.close()
+                        break
+                    song_number, song_name = key.split('_', 1)
+                    with memory.job(f"第{song_number}首 {song_name}（{len(images)}页）") as job:
+                        # 取出已预读的页面（读取失败的页面跳过，与原先拼接时的行为一致）
+                        pages = []
+                        valid_count = sum(1 for img in images if img[1] not in skipped)
+                        for path, data, error in itertools.islice(prefetched_pages, valid_count):
+                            if error is not None:
+                                self.log(f"读取图片出错: {path.name}: {str(error)}")
+                                continue
+                            self.meter.add_read(len(data))
+                            pages.append((path, data))
+
+                        # 更新状态
+                        self.set_status(f"正在处理: 第{song_number}首 {song_name}")
+
+                        levels = None  # 整首歌统一的背景类型和阈值（多页反色+拼接时由各页直方图决定）
+                        recolored = False  # 逐页变色时拼接结果已经变过色
+
+                        # 如果只有一张图片且不是仅拼接模式，直接打开它而不是拼接
+                        if len(images) == 1 and not only_concat:
+                            if not pages:
+                                # 读取出错已记录，跳过这首歌
+                                continue
+                            path, data = pages.pop()
+                            try:
+                                with timer.stage('decode'):
+                                    result_img = decode_image_bytes(data)
+                            except Exception as e:
+                                self.log(f"读取图片出错: {path.name}: {str(e)}")
+                                continue
+                            finally:
+                                del data
+                            job.set_size(result_img.size)
+                        else:
+                            # 拼接图片：先按文件头确定画布，再逐页解码粘贴（多页歌曲的解码计入concat阶段）
+                            streams = [data if isinstance(data, mmap.mmap) else io.BytesIO(data) for _, data in pages]
+                            histograms = {}  # 页序号 -> 直方图future（重新布局时按序号覆盖）
+
+                            def submit_histogram(index, page):
+                                histograms[index] = page_pool.submit(page_histogram, page)
+                            try:
+                                if recolor_pages:
+                                    # 解码、直方图、变色都在各页的线程任务中完成，concat阶段为整个逐页流程的耗时
+                                    with timer.stage('concat'):
+                                        result_img = concat_recolored_pages(
+                                            streams, recolor_page, s['auto_threshold'], page_pool.map,
+                                            on_error=lambda index, e: self.log(f"读取图片出错: {pages[index][0].name}: {str(e)}"))
+                                    recolored = True
+                                else:
+                                    with timer.stage('concat'):
+                                        result_img = vertical_concat_images(
+                                            streams,
+                                            on_error=lambda index, e: self.log(f"读取图片出错: {pages[index][0].name}: {str(e)}"),
+                                            on_page=submit_histogram if group_levels else None)
+                                    if histograms:
+                                        levels = histogram_levels(sum(future.result() for future in histograms.values()),
+                                                                  s['auto_threshold'])
+                                job.set_size(result_img.size)
+                            except Exception as e:
+                                self.log(f"拼接图片出错: {str(e)}")
+                                continue  # 跳过这首歌
+                            finally:
+                                for stream in streams:
+                                    stream.close()
+                                del streams, pages
+
+                        # 如果需要反色处理（不是仅拼接模式）
+                        if invert and not only_concat and not recolored:
+                            try:
+                                # 执行反色处理
+                                with timer.stage('recolor'):
+                                    result_img = self.recolor(result_img, levels)
+                            except Exception as e:
+                                # 但仍然继续处理，保存原始图像
+                                self.log(f"反色处理错误: {str(e)}")
+
+                        # 确保图像是RGB模式（没有透明通道）
+                        try:
+                            # 更新文件命名，恢复原始的命名规则
+                            output_filename = f"第{song_number}首 {song_name}.jpg"
+
+                            output_path = output_folder / output_filename
+                            # 使用压缩设置编码，写盘交给I/O线程
+                            with timer.stage('encode'):
+                                output_data = self.encode_image(result_img)
+
+                            # 记录日志
+                            if len(images) == 1 and not only_concat:
+                                if invert:
+                                    log_msg = f"已反色处理并保存: {output_filename}"
+                                else:
+                                    log_msg = f"已处理并保存: {output_filename}"
+                            else:
+                                if invert:
+                                    log_msg = f"已反色拼接并保存: {output_filename}"
+                                elif only_concat:
+                                    log_msg = f"已拼接并保存: {output_filename}"
+                                else:
+                                    log_msg = f"已拼接并保存: {output_filename}"
+                            pending_writes.append((log_msg, writer.write(output_path, output_data), len(output_data)))
+                            self.meter.job_done(result_img.width * result_img.height)
+                        except Exception as e:
+                            self.log(f"保存图片出错: {str(e)}")
+                        drain_writes(block=False)
+
+                    # 更新进度条
+                    processed_count += 1
+                    self.update_progress(processed_count, total_songs)
+
+            drain_writes(block=True)
+
+    def plan_jobs(self, jobs, timer, label=None, largest_first=False):
+        """生成处理计划（只读文件头），在日志中报告，并告知吞吐量统计各任务的像素数
+
+        largest_first: 按像素数从大到小排序（歌曲逐首处理，排序不影响总耗时，保持原顺序）
+        """
+        with timer.stage('plan'):
+            plan = BatchPlan(jobs, self.settings['io_workers'])
+        if largest_first:
+            plan.sort_largest_first()
+        self.meter.plan([job['cost'] for job in plan.jobs])
+        quality = self.settings['use_quality_mode'] or self.settings['use_auto_mode']
+        for line in plan.format_summary(quality=quality, label=label):
+            self.log(line)
+        self.log("=" * 50)
+        return plan
+
+    def report_timing(self, timer, memory):
+        """在日志中显示性能统计，并按设置写入输出文件夹的JSON文件（同时开启内存统计时一并写入）"""
+        self.log("=" * 50)
+        for line in timer.format_summary():
+            self.log(line)
+
+        if self.settings['save_timing_json']:
+            try:
+                json_path = Path(self.settings['output_folder']) / f"性能统计_{time.strftime('%Y%m%d_%H%M%S')}.json"
+                report = timer.summary()
+                report['version'] = __version__
+                report['mode'] = self.settings['process_mode']
+                if memory.enabled:
+                    report['memory'] = memory.summary()
+                with json_path.open('w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                self.log(f"性能统计已保存: {json_path.name}")
+            except Exception as e:
+                self.log(f"保存性能统计失败: {str(e)}")
+
+    def report_memory(self, memory):
+        """在日志中显示内存峰值统计"""
+        self.log("=" * 50)
+        for line in memory.format_summary():
+            self.log(line)
+
+    def report_profile(self, profiler):
+        """在日志中显示热点函数，并把采样结果保存为speedscope格式文件"""
+        self.log("=" * 50)
+        self.log(f"🔍 性能剖析: 共 {profiler.sample_count} 次采样（每{profiler.interval * 1000:.0f}ms一次，覆盖所有线程）")
+        self.log(f"{'自身%':>7}{'累计%':>7}  函数")
+        for name, self_percent, total_percent in profiler.top_functions(15):
+            self.log(f"{self_percent:>7.1f}{total_percent:>7.1f}  {name}")
+
+        try:
+            profile_path = Path(self.settings['output_folder']) / f"性能剖析_{time.strftime('%Y%m%d_%H%M%S')}.speedscope.json"
+            profiler.save_speedscope(profile_path)
+            self.log(f"剖析结果已保存: {profile_path.name}（可在 https://www.speedscope.app 打开）")
+        except Exception as e:
+            self.log(f"保存剖析结果失败: {str(e)}")
+
+class FolderWatcher:
+    """监视模式：扫描仪不断往输入文件夹放入新页面时，自动处理新到的歌曲
+
+    每隔interval秒扫描一次输入文件夹，比对每个图片文件的大小和修改时间（纯标准库轮询，
+    在网络共享盘上也可用）。新增或修改的文件按 extract_info 归到所属歌曲（仅反色模式按单个文件），
+    一首歌的所有页面连续settle秒没有变化后才处理，避免扫描仪还在逐页写入时拼出缺页的歌曲。
+    只重新处理受影响的歌曲，沿用同一个 BatchProcessor（keep_pool），各线程池和自适应并发数在两批之间保持预热。
+    启动时已有的文件视为已处理。
+    """
+
+    def __init__(self, processor, interval=2.0, settle=5.0):
+        self.processor = processor
+        self.interval = interval
+        self.settle = settle
+        self.input_path = Path(processor.settings['input_folder'])
+        self.by_file = processor.settings['process_mode'] == 'invert_only'
+        self._snapshot = {}
+        self._pending = {}  # 任务键 -> 最后一次发生变化的时间
+
+    def scan(self):
+        """返回 {文件名: (大小, 修改时间)}"""
+        snapshot = {}
+        with os.scandir(self.input_path) as entries:
+            for entry in entries:
+                if os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS:
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    pass  # 扫描时文件刚好被删除或移动
+        return snapshot
+
+    def job_key(self, name):
+        """文件所属的任务：仅反色模式为文件本身，其他模式为歌曲（无法识别的文件名返回None，与批处理一致地忽略）"""
+        if self.by_file:
+            return name
+        info = extract_info(name)
+        return f"{info[0]}_{info[1]}" if info else None
+
+    def poll(self, now=None):
+        """扫描一次，返回现在可以处理的文件名列表（所属任务已稳定settle秒）"""
+        now = time.monotonic() if now is None else now
+        snapshot = self.scan()
+        for name, stat in snapshot.items():
+            if self._snapshot.get(name) != stat:
+                key = self.job_key(name)
+                if key is not None:
+                    self._pending[key] = now
+        self._snapshot = snapshot
+
+        ready = {key for key, changed in self._pending.items() if now - changed >= self.settle}
+        if not ready:
+            return []
+        for key in ready:
+            del self._pending[key]
+        # 处理受影响歌曲的全部页面（不只是新到的那几页）
+        return sorted(name for name in snapshot if self.job_key(name) in ready)
+
+    def run(self):
+        """持续监视，直到 processor.control 被取消"""
+        processor = self.processor
+        control = processor.control
+        self._snapshot = self.scan()
+        processor.log(f"👀 开始监视: {self.input_path}（每{self.interval:g}秒检查一次，"
+                      f"页面{self.settle:g}秒内没有变化后处理；已有的{len(self._snapshot)}个文件视为已处理）")
+        processor.set_status("正在监视输入文件夹...")
+        try:
+            while control.sleep(self.interval):
+                if not control.checkpoint():
+                    break
+                files = self.poll()
+                if not files:
+                    continue
+                processor.log("=" * 50)
+                processor.log(f"📥 {time.strftime('%H:%M:%S')} 发现新文件，处理 {len(files)} 个文件")
+                processor.run(files)
+                if control.cancelled:
+                    break
+                processor.set_status(f"正在监视输入文件夹...（上次处理: {time.strftime('%H:%M:%S')}）")
+        finally:
+            processor.close()
+        processor.log("⏹ 已停止监视")
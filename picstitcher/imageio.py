@@ -0,0 +1,212 @@
+"""图片读写：整块读取/解码、原子写入、JPEG编码，以及后台预读和异步写盘"""
+import io
+import itertools
+import mmap
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, UnidentifiedImageError
+
+from .perf import StageTimer
+from .settings import DEFAULT_IO_WORKERS, DEFAULT_PREFETCH_AHEAD
+
+def read_image_size(path):
+    """只读取图片文件头获取尺寸 (宽, 高)，不解码像素；无法识别时返回None"""
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+def probe_image_sizes(paths, io_workers=DEFAULT_IO_WORKERS):
+    """用I/O线程池并行读取多个文件头，返回与paths顺序一致的尺寸列表（无法识别的为None）"""
+    paths = list(paths)
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(io_workers, len(paths)))) as pool:
+        return list(pool.map(read_image_size, paths))
+
+def read_file_bytes(path, use_mmap=False):
+    """一次性读取文件的全部原始字节
+
+    Pillow按路径打开时会做很多次小读取，在网络盘上每次都有往返延迟；这里只做一次整块读取。
+
+    Args:
+        path: 文件路径
+        use_mmap: True时返回只读mmap（仅适合本地磁盘：网络盘上mmap会把读取推迟到解码时的缺页）
+
+    Returns:
+        bytes 或 mmap.mmap
+    """
+    with open(path, 'rb') as f:
+        if use_mmap and os.fstat(f.fileno()).st_size > 0:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return f.read()
+
+def decode_image_bytes(data):
+    """从预读的原始字节解码图片，解码完成后释放原始缓冲区
+
+    bytes通过BytesIO交给Pillow（CPython中用bytes初始化BytesIO共享同一块内存，不会复制），
+    mmap本身就是文件对象，直接交给Pillow。解码后图片不再引用原始缓冲区，mmap立即关闭。
+
+    Args:
+        data: read_file_bytes() 的返回值（bytes 或 mmap.mmap）
+
+    Returns:
+        PIL.Image: 已完全加载的图片
+    """
+    stream = data if isinstance(data, mmap.mmap) else io.BytesIO(data)
+    try:
+        try:
+            img = Image.open(stream)
+        except UnidentifiedImageError:
+            # 默认的错误信息里是BytesIO对象的地址，对用户没有意义
+            raise UnidentifiedImageError("无法识别的图片格式") from None
+        img.load()
+        # 多帧格式（GIF等）加载后仍持有文件对象，断开它以便原始缓冲区可以立即回收
+        img.fp = None
+        return img
+    finally:
+        stream.close()
+
+def write_file_bytes(path, data):
+    """一次性写出全部字节
+
+    先写入同目录下的 .part 临时文件，写完后再改名为目标文件名，
+    中途取消、出错或程序被关闭时不会留下只写了一半的输出图片。
+    """
+    path = Path(path)
+    part_path = path.with_name(path.name + '.part')
+    try:
+        with open(part_path, 'wb') as f:
+            f.write(data)
+        os.replace(part_path, path)
+    except BaseException:
+        try:
+            part_path.unlink()
+        except OSError:
+            pass
+        raise
+
+def encode_image_with_compression(image, enable_compression=True, compression_quality=82):
+    """按压缩设置把图片编码为JPEG字节（不落盘，写盘交给AsyncWriter）
+
+    Args:
+        image: PIL.Image对象
+        enable_compression: 是否启用压缩优化
+        compression_quality: 压缩质量(70-95)
+
+    Returns:
+        bytes: JPEG文件内容
+    """
+    # 确保图像是RGB模式（没有透明通道）
+    if image.mode == 'RGBA':
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    if enable_compression:
+        # 启用压缩：使用优化参数
+        image.save(buffer, format='JPEG', quality=compression_quality, optimize=True, progressive=True)
+    else:
+        # 不压缩：使用高质量参数
+        image.save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+def save_image_with_compression(image, output_path, enable_compression=True, compression_quality=82):
+    """根据压缩设置保存图片
+
+    Args:
+        image: PIL.Image对象
+        output_path: 输出路径
+        enable_compression: 是否启用压缩优化
+        compression_quality: 压缩质量(70-95)
+    """
+    write_file_bytes(output_path, encode_image_with_compression(image, enable_compression, compression_quality))
+
+class FilePrefetcher:
+    """文件预读器：用独立的I/O线程池提前读取后续N个文件的原始字节
+
+    网络共享盘（SMB/NFS）上每次打开/读取都有毫秒级延迟，如果让CPU线程自己读文件，
+    大部分时间都阻塞在I/O上。预读器让I/O并发与CPU并发解耦：CPU线程拿到的是已在内存中的字节。
+
+    按传入顺序迭代，每项为 (path, data, error)，读取失败时data为None、error为异常对象。
+    """
+
+    def __init__(self, paths, ahead=DEFAULT_PREFETCH_AHEAD, io_workers=DEFAULT_IO_WORKERS, use_mmap=False, timer=None):
+        self.paths = list(paths)
+        self.ahead = max(1, ahead)
+        self.io_workers = max(1, io_workers)
+        self.use_mmap = use_mmap
+        self.timer = timer if timer is not None else StageTimer()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        with ThreadPoolExecutor(max_workers=self.io_workers) as pool:
+            remaining = iter(self.paths)
+            # 先提交前N个读取任务，之后每消费一个再补一个，内存中最多保留N个文件
+            pending = deque((path, pool.submit(self._read, path))
+                            for path in itertools.islice(remaining, self.ahead))
+            try:
+                while pending:
+                    path, future = pending.popleft()
+                    for next_path in itertools.islice(remaining, 1):
+                        pending.append((next_path, pool.submit(self._read, next_path)))
+                    try:
+                        yield path, future.result(), None
+                    except Exception as e:
+                        yield path, None, e
+            finally:
+                # 提前结束迭代（如取消处理）时丢弃还没开始的读取，只等待正在读的文件
+                for _, future in pending:
+                    future.cancel()
+
+    def _read(self, path):
+        with self.timer.stage('read'):
+            data = read_file_bytes(path, self.use_mmap)
+        self.timer.count(bytes_in=len(data))
+        return data
+
+class AsyncWriter:
+    """异步写出器：结果字节交给独立的I/O线程池写盘，CPU线程不必等待网络盘写入
+
+    待写数据量上限为 max_pending 个文件，超过时 write() 会阻塞（反压），避免结果在内存中堆积。
+    """
+
+    def __init__(self, io_workers=DEFAULT_IO_WORKERS, max_pending=DEFAULT_PREFETCH_AHEAD, timer=None):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, io_workers))
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self.timer = timer if timer is not None else StageTimer()
+
+    def write(self, output_path, data):
+        """提交一个写盘任务，返回Future（结果为output_path，失败时抛出写盘异常）"""
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._write, output_path, data)
+        except Exception:
+            self._slots.release()
+            raise
+        return future
+
+    def _write(self, output_path, data):
+        try:
+            with self.timer.stage('write'):
+                write_file_bytes(output_path, data)
+            self.timer.count(bytes_out=len(data))
+            return output_path
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """等待所有写盘任务完成"""
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
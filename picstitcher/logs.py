@@ -0,0 +1,40 @@
+"""日志文件：按内容分级，写入轮转的日志文件"""
+import logging
+import logging.handlers
+from pathlib import Path
+
+from .settings import get_config_path
+
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024   # 单个日志文件上限，超过后轮转
+LOG_FILE_BACKUPS = 3                   # 保留的旧日志文件数
+
+def get_log_path():
+    """完整日志文件路径（与config.json同目录下的logs文件夹）"""
+    return get_config_path().parent / 'logs' / 'PicStitcher.log'
+
+def classify_log_message(message):
+    """按日志内容判断级别（logging.ERROR / WARNING / INFO），用于日志文件和"仅显示错误/警告"过滤"""
+    if any(marker in message for marker in ('✗', '出错', '错误', '失败')):
+        return logging.ERROR
+    if any(marker in message for marker in ('⚠', '没有找到', '跳过')):
+        return logging.WARNING
+    return logging.INFO
+
+def create_file_logger(log_path=None):
+    """创建写入轮转日志文件的logger，无法创建日志文件时返回None"""
+    log_path = Path(log_path) if log_path else get_log_path()
+    logger = logging.getLogger('PicStitcher')
+    if logger.handlers:
+        return logger
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+    except Exception as e:
+        print(f"创建日志文件失败: {e}")
+        return None
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
@@ -0,0 +1,40 @@
+"""文件名规则：从文件名中识别歌曲编号、歌名和页码"""
+import re
+from pathlib import Path
+
+# 支持的输入图片扩展名
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif'}
+
+def extract_info(filename):
+    """从文件名中提取歌曲编号、歌名和页码"""
+    # 使用 pathlib 获取文件名（无扩展名）
+    file_stem = Path(filename).stem
+    
+    # 原有的正则表达式模式
+    pattern1 = r'第(\d+)首\s+(.+?)(\d+)$'
+    match = re.match(pattern1, file_stem)
+    if match:
+        song_number = match.group(1)
+        song_name = match.group(2).strip()
+        page_number = int(match.group(3))
+        return song_number, song_name, page_number
+    
+    # 新增的正则表达式模式，匹配"001.圣哉三一歌1"这样的格式
+    pattern2 = r'(\d+)\.(.+?)(\d+)$'
+    match = re.match(pattern2, file_stem)
+    if match:
+        song_number = match.group(1)
+        song_name = match.group(2).strip()
+        page_number = int(match.group(3))
+        return song_number, song_name, page_number
+    
+    # 新增模式，匹配"第0707愿将我的心给你1"这样的格式
+    pattern3 = r'第(\d+)([^0-9].+?)(\d+)$'
+    match = re.match(pattern3, file_stem)
+    if match:
+        song_number = match.group(1)
+        song_name = match.group(2).strip()
+        page_number = int(match.group(3))
+        return song_number, song_name, page_number
+    
+    return None
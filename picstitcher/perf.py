@@ -0,0 +1,500 @@
+"""性能分析：分阶段计时、吞吐量/剩余时间、内存峰值和采样剖析"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from pathlib import Path
+
+from . import __version__
+
+class StageTimer:
+    """分阶段计时器：统计解码、拼接、变色、编码、读写等各阶段耗时
+
+    基于 time.perf_counter，线程安全（工作线程和I/O线程可同时记录）。
+    未启用时 stage() 返回共享的空上下文、count() 直接返回，几乎没有额外开销。
+
+    用法:
+        timer = StageTimer(enabled=True)
+        with timer.stage('decode'):
+            img = decode_image_bytes(data)
+        timer.count(images=1)
+        for line in timer.format_summary(): print(line)
+    """
+
+    _DISABLED = nullcontext()
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._samples = defaultdict(list)
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._start = time.perf_counter()
+
+    def stage(self, name):
+        """返回计时上下文，with块内的耗时计入name阶段"""
+        if not self.enabled:
+            return self._DISABLED
+        return _StageContext(self, name)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+
+    def count(self, images=0, bytes_in=0, bytes_out=0):
+        """累计输出图片数和读写字节数（用于计算 张/秒 和 MB/s）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.images += images
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def summary(self):
+        """返回统计结果字典（可直接写成JSON）"""
+        elapsed = time.perf_counter() - self._start
+        stages = {}
+        with self._lock:
+            for name, samples in self._samples.items():
+                ordered = sorted(samples)
+                p95_index = max(0, math.ceil(len(ordered) * 0.95) - 1)
+                stages[name] = {
+                    'count': len(ordered),
+                    'total_s': sum(ordered),
+                    'mean_ms': sum(ordered) * 1000 / len(ordered),
+                    'p95_ms': ordered[p95_index] * 1000,
+                }
+            images, bytes_in, bytes_out = self.images, self.bytes_in, self.bytes_out
+        return {
+            'elapsed_s': elapsed,
+            'images': images,
+            'images_per_s': images / elapsed if elapsed > 0 else 0.0,
+            'read_mb_per_s': bytes_in / 1024 / 1024 / elapsed if elapsed > 0 else 0.0,
+            'write_mb_per_s': bytes_out / 1024 / 1024 / elapsed if elapsed > 0 else 0.0,
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'stages': stages,
+        }
+
+    def format_summary(self):
+        """返回用于日志显示的多行文本"""
+        result = self.summary()
+        lines = [
+            f"⏱ 性能统计: 总耗时 {result['elapsed_s']:.2f}s, {result['images']} 张, "
+            f"{result['images_per_s']:.2f} 张/秒, 读取 {result['read_mb_per_s']:.2f} MB/s, "
+            f"写入 {result['write_mb_per_s']:.2f} MB/s",
+            f"{'阶段':<8}{'次数':>6}{'合计(s)':>10}{'平均(ms)':>10}{'P95(ms)':>10}",
+        ]
+        # 各阶段按合计耗时从高到低排列，瓶颈一目了然
+        for name, stage in sorted(result['stages'].items(), key=lambda item: -item[1]['total_s']):
+            lines.append(f"{name:<8}{stage['count']:>6}{stage['total_s']:>10.2f}"
+                         f"{stage['mean_ms']:>10.1f}{stage['p95_ms']:>10.1f}")
+        return lines
+
+class _StageContext:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+def format_duration(seconds):
+    """把秒数格式化为 mm:ss 或 h:mm:ss"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    if hours:
+        return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+    return f"{rest // 60:02d}:{rest % 60:02d}"
+
+class ThroughputMeter:
+    """实时吞吐量和剩余时间估计（始终开启，开销只是几次加法）
+
+    张/秒、读写MB/s为开始以来的平均值；剩余时间按像素加权：
+    用最近window个完成任务的像素数和所用时间算出处理速度（像素/秒），
+    剩余像素数在已知各任务尺寸时（plan）直接累加，否则按最近任务的平均像素数估计
+    （拼接后的歌曲大小差别很大，按张数平均误差很大）。
+    只在处理线程中调用，不需要加锁。
+    """
+
+    def __init__(self, window=30):
+        self.start_time = time.perf_counter()
+        self.jobs = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # 最近完成的任务 (完成时间, 像素数)，第一项是计时起点
+        self._recent = deque([(self.start_time, 0)], maxlen=window + 1)
+        self._recent_pixels = 0
+        self._remaining_pixels = None  # 按任务顺序的剩余像素数（已知各任务像素数时，见plan）
+
+    def plan(self, costs):
+        """告知各任务按处理顺序的像素数（来自文件头），剩余时间改用准确的剩余像素数计算"""
+        remaining = [0]
+        for cost in reversed(costs):
+            remaining.append(remaining[-1] + cost)
+        self._remaining_pixels = remaining[::-1]
+
+    def add_read(self, nbytes):
+        self.bytes_read += nbytes
+
+    def add_written(self, nbytes):
+        self.bytes_written += nbytes
+
+    def job_done(self, pixels=0):
+        """记录一个完成的任务（失败的任务像素数为0）"""
+        self.jobs += 1
+        if len(self._recent) == self._recent.maxlen:
+            # 窗口已满：最老的一项变成新的计时起点，它的像素不再计入
+            self._recent_pixels -= self._recent[1][1]
+        self._recent.append((time.perf_counter(), pixels))
+        self._recent_pixels += pixels
+
+    def snapshot(self, done, total):
+        """返回当前统计：elapsed、images_per_s、read_mb_per_s、write_mb_per_s、eta（秒，无法估计时为None）"""
+        elapsed = time.perf_counter() - self.start_time
+        stats = {
+            'elapsed': elapsed,
+            'images_per_s': self.jobs / elapsed if elapsed > 0 else 0.0,
+            'read_mb_per_s': self.bytes_read / 1024 / 1024 / elapsed if elapsed > 0 else 0.0,
+            'write_mb_per_s': self.bytes_written / 1024 / 1024 / elapsed if elapsed > 0 else 0.0,
+            'eta': None,
+        }
+        recent_jobs = len(self._recent) - 1
+        span = self._recent[-1][0] - self._recent[0][0]
+        remaining = max(total - done, 0)
+        if remaining == 0:
+            stats['eta'] = 0.0
+        elif recent_jobs and span > 0:
+            if self._recent_pixels:
+                if self._remaining_pixels is not None and len(self._remaining_pixels) == total + 1:
+                    remaining_pixels = self._remaining_pixels[done]
+                else:
+                    remaining_pixels = remaining * self._recent_pixels / recent_jobs
+                stats['eta'] = remaining_pixels / (self._recent_pixels / span)
+            else:
+                stats['eta'] = remaining * span / recent_jobs
+        return stats
+
+def format_progress_stats(stats):
+    """把 ThroughputMeter.snapshot() 的结果格式化为一行文字（状态栏和命令行共用）"""
+    eta = '--:--' if stats['eta'] is None else format_duration(stats['eta'])
+    return (f"{stats['images_per_s']:.1f} 张/秒 | 读 {stats['read_mb_per_s']:.1f} MB/s"
+            f" 写 {stats['write_mb_per_s']:.1f} MB/s | 已用 {format_duration(stats['elapsed'])} | 剩余约 {eta}")
+
+# read_rss使用的psutil.Process：第一次调用时尝试导入，未安装时记为False，之后不再重复尝试导入
+_psutil_process = None
+
+def read_rss():
+    """读取当前进程的常驻内存（RSS，字节），无法读取时返回None
+
+    优先使用psutil（可选依赖），否则Linux读/proc，Windows调用GetProcessMemoryInfo。
+    """
+    global _psutil_process
+    if _psutil_process is None:
+        try:
+            import psutil
+            _psutil_process = psutil.Process()
+        except Exception:
+            _psutil_process = False
+    if _psutil_process:
+        try:
+            return _psutil_process.memory_info().rss
+        except Exception:
+            return None
+
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm', 'rb') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            get_info = ctypes.windll.psapi.GetProcessMemoryInfo
+            get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+            if get_info(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+    except Exception:
+        pass
+    return None
+
+class MemoryTracker:
+    """内存峰值跟踪：记录每张图片/每首歌处理期间的进程内存峰值
+
+    后台线程每隔interval秒采样一次进程RSS，每个任务记录其运行期间见到的最高值
+    （多线程并发时，同时运行的任务会看到同一个峰值，排在前面的仍是最可疑的任务）。
+    无法读取RSS时改用tracemalloc（只统计Python和NumPy的分配，不含Pillow内部缓冲区）。
+    未启用时 job() 返回空任务，没有额外开销。
+
+    用法:
+        memory = MemoryTracker(enabled=True)
+        memory.start()
+        with memory.job('第001首 歌名') as job:
+            ...
+            job.set_size(img.size)
+        memory.stop()
+        for line in memory.format_summary(): print(line)
+    """
+
+    def __init__(self, enabled=False, interval=0.01):
+        self.enabled = enabled
+        self.interval = interval
+        self.source = None
+        self.peak = 0
+        self._jobs = []        # 已完成任务: {'name', 'peak', 'start', 'size'}
+        self._active = set()   # 运行中的任务
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read(self):
+        if self.source == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[0]
+        return read_rss() or 0
+
+    def start(self):
+        if not self.enabled:
+            return
+        if read_rss() is not None:
+            self.source = 'RSS'
+        else:
+            self.source = 'tracemalloc'
+            tracemalloc.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='MemoryTracker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self.source == 'tracemalloc':
+            tracemalloc.stop()
+
+    def _sample(self):
+        value = self._read()
+        with self._lock:
+            self.peak = max(self.peak, value)
+            for job in self._active:
+                job.peak = max(job.peak, value)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def job(self, name):
+        """返回任务上下文，with块运行期间的内存峰值计入该任务"""
+        if not self.enabled:
+            return _NULL_MEMORY_JOB
+        return _MemoryJob(self, name)
+
+    def _begin(self, job):
+        job.start = job.peak = self._read()
+        with self._lock:
+            self._active.add(job)
+
+    def _end(self, job):
+        self._sample()
+        with self._lock:
+            self._active.discard(job)
+            self._jobs.append({'name': job.name, 'peak': job.peak, 'start': job.start, 'size': job.size})
+
+    def summary(self, top=10):
+        """返回统计结果字典（可直接写成JSON）"""
+        with self._lock:
+            jobs = sorted(self._jobs, key=lambda job: -job['peak'])
+            peak = self.peak
+        return {
+            'source': self.source,
+            'peak_mb': peak / 1024 / 1024,
+            'jobs': len(jobs),
+            'top': [{
+                'name': job['name'],
+                'peak_mb': job['peak'] / 1024 / 1024,
+                'increase_mb': (job['peak'] - job['start']) / 1024 / 1024,
+                'size': list(job['size']) if job['size'] else None,
+            } for job in jobs[:top]],
+        }
+
+    def format_summary(self, top=10):
+        """返回用于日志显示的多行文本"""
+        result = self.summary(top)
+        lines = [
+            f"💾 内存统计（{result['source']}）: 峰值 {result['peak_mb']:.1f} MB, 共 {result['jobs']} 个任务，占用最高的任务:",
+            f"{'峰值(MB)':>10}{'增量(MB)':>10}{'尺寸':>14}  名称",
+        ]
+        for job in result['top']:
+            size = f"{job['size'][0]}x{job['size'][1]}" if job['size'] else '-'
+            lines.append(f"{job['peak_mb']:>10.1f}{job['increase_mb']:>10.1f}{size:>14}  {job['name']}")
+        return lines
+
+class _MemoryJob:
+    def __init__(self, tracker, name):
+        self.tracker = tracker
+        self.name = name
+        self.size = None
+        self.start = self.peak = 0
+
+    def set_size(self, size):
+        """记录该任务的图片尺寸（拼接后的画布尺寸），便于据此设定内存预算"""
+        self.size = size
+
+    def __enter__(self):
+        self.tracker._begin(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.tracker._end(self)
+
+class _NullMemoryJob:
+    def set_size(self, size):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL_MEMORY_JOB = _NullMemoryJob()
+
+class SamplingProfiler:
+    """低开销采样剖析器：后台线程定时采集所有线程的调用栈
+
+    批处理的工作分布在CPU线程池和I/O线程中，cProfile只能剖析启用它的那个线程
+    （Python 3.12起同一时间也只允许一个剖析工具），所以这里用 sys._current_frames()
+    定时采样所有线程。空闲等待（线程池等任务、等锁、Tk主循环）的样本不计入。
+    结果可保存为 speedscope 格式，在 https://www.speedscope.app 中查看火焰图。
+    """
+
+    # 空闲等待时所在的函数（文件名, 函数名），这些样本不计入热点
+    IDLE_LEAVES = {
+        ('threading.py', 'wait'),
+        ('threading.py', '_wait_for_tstate_lock'),
+        ('thread.py', '_worker'),
+        ('__init__.py', 'mainloop'),
+    }
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.sample_count = 0
+        self._frames = []                # [(函数名, 文件, 行号)]
+        self._frame_ids = {}
+        self._stacks = defaultdict(int)  # (线程名, 调用栈) -> 采样次数
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _frame_id(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self._frames)
+            self._frames.append(key)
+        return frame_id
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in self.IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()  # 从最外层调用到当前函数
+                self._stacks[(names.get(thread_id, str(thread_id)), tuple(stack))] += 1
+            self.sample_count += 1
+
+    def top_functions(self, limit=15):
+        """返回 [(函数描述, 自身占比%, 累计占比%)]，按自身占比从高到低"""
+        self_counts = defaultdict(int)
+        total_counts = defaultdict(int)
+        busy_samples = 0
+        for (_, stack), count in self._stacks.items():
+            busy_samples += count
+            self_counts[stack[-1]] += count
+            for frame_id in set(stack):
+                total_counts[frame_id] += count
+        if not busy_samples:
+            return []
+        ranked = sorted(self_counts, key=lambda frame_id: -self_counts[frame_id])[:limit]
+        result = []
+        for frame_id in ranked:
+            name, filename, line = self._frames[frame_id]
+            result.append((f"{name} ({os.path.basename(filename)}:{line})",
+                           self_counts[frame_id] * 100 / busy_samples,
+                           total_counts[frame_id] * 100 / busy_samples))
+        return result
+
+    def save_speedscope(self, path):
+        """保存为speedscope的sampled格式，每个线程一个profile"""
+        by_thread = defaultdict(list)
+        for (thread_name, stack), count in self._stacks.items():
+            by_thread[thread_name].append((list(stack), count * self.interval))
+        profiles = []
+        for thread_name, stacks in sorted(by_thread.items()):
+            total = sum(weight for _, weight in stacks)
+            profiles.append({
+                'type': 'sampled',
+                'name': thread_name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': total,
+                'samples': [stack for stack, _ in stacks],
+                'weights': [weight for _, weight in stacks],
+            })
+        document = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'exporter': f'PicStitcher {__version__}',
+            'name': Path(path).name,
+            'shared': {'frames': [{'name': name, 'file': filename, 'line': line}
+                                  for name, filename, line in self._frames]},
+            'profiles': profiles,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False)
@@ -0,0 +1,74 @@
+"""颜色预览：缩小的样张 + 缓存的文字权重，换颜色时几毫秒内重新渲染"""
+import numpy as np
+from PIL import Image
+
+from .api import recolor_image
+from .recolor import text_color_table
+
+DEFAULT_PREVIEW_SIZE = (480, 360)
+
+class RecolorPreview:
+    """一页图片的颜色预览
+
+    图片先缩小到预览尺寸（JPEG用draft在解码时直接按1/2~1/8缩小，其他格式用Image.reduce整数倍缩小），
+    再用真正的变色引擎以白色渲染一次得到每个像素的文字权重（0-255，每种引擎只算一次并缓存；
+    快速/高质量模式只有0和255，抗锯齿模式有中间值）。之后每次换颜色只需要按权重查表填色，
+    结果与引擎直接处理这张缩小图完全相同。
+    """
+
+    def __init__(self, image, max_size=DEFAULT_PREVIEW_SIZE):
+        self.source_size = image.size
+        self.has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        self.image = self.downscale(image, max_size)
+        self._weights = {}
+
+    @classmethod
+    def open(cls, path, max_size=DEFAULT_PREVIEW_SIZE):
+        """打开图片文件并生成预览（不解码全尺寸像素：JPEG直接按缩小比例解码）"""
+        with Image.open(path) as image:
+            source_size = image.size
+            image.draft(None, max_size)
+            image.load()
+            preview = cls(image, max_size)
+        preview.source_size = source_size
+        return preview
+
+    def downscale(self, image, max_size):
+        """缩小到不超过max_size（保持比例），带透明通道的图片保留RGBA，其余转为RGB"""
+        mode = 'RGBA' if self.has_alpha else 'RGB'
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert(mode)
+        # 先整数倍缩小（很快），再精确缩放到目标尺寸
+        factor = min(image.width // max_size[0], image.height // max_size[1])
+        if factor > 1:
+            image = image.reduce(factor)
+        if image.mode != mode:
+            image = image.convert(mode)
+        scale = min(max_size[0] / image.width, max_size[1] / image.height, 1)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.BILINEAR)
+        return image
+
+    def engine(self, algorithm):
+        """算法模式实际使用的引擎（智能模式下带透明通道用高质量模式）"""
+        if algorithm == 'quality' or (algorithm == 'auto' and self.has_alpha):
+            return 'quality'
+        return 'smooth' if algorithm == 'smooth' else 'fast'
+
+    def weights(self, algorithm, auto_threshold=False):
+        """文字权重（uint8数组），每种引擎（及阈值方式）只计算一次"""
+        key = (self.engine(algorithm), auto_threshold)
+        weights = self._weights.get(key)
+        if weights is None:
+            # 以白色渲染：每个像素的R值就是文字权重（权重255为文字，0为黑色背景）
+            weights = np.array(recolor_image(self.image, (255, 255, 255), key[0], auto_threshold))[..., 0]
+            self._weights[key] = weights
+        return weights
+
+    def render(self, color, algorithm='auto', auto_threshold=False):
+        """按颜色、算法模式和阈值方式渲染预览，返回RGB图片"""
+        # 权重作为调色板索引，调色板就是"权重 -> 颜色"表（与抗锯齿引擎的查表方式相同）
+        indexed = Image.fromarray(self.weights(algorithm, auto_threshold), 'P')
+        indexed.putpalette(text_color_table(np.arange(256, dtype=np.uint8), *color).tobytes())
+        return indexed.convert('RGB')
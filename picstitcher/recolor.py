@@ -0,0 +1,466 @@
+"""变色引擎：背景检测、快速模式（V1.5）、高质量模式（V1.4）和抗锯齿模式"""
+import numpy as np
+from PIL import Image
+
+# 抗锯齿模式的过渡宽度：亮度在阈值两侧各32级内按比例混合背景色和文字颜色
+SMOOTH_RAMP_WIDTH = 64
+
+# 分块变色：每块至少这么多行（块太小时线程调度的开销比计算本身还大）
+MIN_BAND_ROWS = 64
+
+# 自动阈值：两类（文字/背景）平均亮度相差不到这个值时认为没有文字（空白页、纯色图），仍用固定阈值
+AUTO_THRESHOLD_MIN_CONTRAST = 40
+
+def detect_background_type(image):
+    """检测图片背景类型（深色或浅色）
+
+    通过采样图片四个边缘的像素，计算平均亮度来判断背景类型。
+
+    Args:
+        image: PIL.Image对象
+
+    Returns:
+        str: 'dark' 或 'light'
+    """
+    try:
+        w, h = image.size
+
+        # 边缘区域大小（取图片尺寸的10%）
+        edge_size = max(min(h, w) // 10, 5)  # 至少5像素
+
+        # 只裁出四个边缘再转换为RGB（不复制整张图片），像素与顺序和整图切片相同
+        edge_boxes = (
+            (0, 0, w, min(edge_size, h)),              # 上
+            (0, max(h - edge_size, 0), w, h),          # 下
+            (0, 0, min(edge_size, w), h),              # 左
+            (max(w - edge_size, 0), 0, w, h),          # 右
+        )
+
+        # 合并所有边缘像素
+        edges = np.concatenate([
+            np.asarray(image.crop(box).convert('RGB')).reshape(-1, 3)
+            for box in edge_boxes
+        ])
+
+        # 计算边缘平均亮度（使用标准亮度公式）
+        luminance = (
+            0.299 * edges[:, 0] +
+            0.587 * edges[:, 1] +
+            0.114 * edges[:, 2]
+        )
+        avg_luminance = np.mean(luminance)
+
+        # 判断背景类型
+        # 阈值80：低于80认为是深色背景，高于80认为是浅色背景
+        return 'dark' if avg_luminance < 80 else 'light'
+
+    except Exception as e:
+        print(f"检测背景类型失败: {e}")
+        # 默认返回浅色背景（使用原有逻辑）
+        return 'light'
+
+def otsu_threshold(histogram, min_contrast=AUTO_THRESHOLD_MIN_CONTRAST):
+    """Otsu法：在256级亮度直方图上找使类间方差最大的分界
+
+    Args:
+        histogram: 长度256的像素计数（np.bincount或Image.histogram()的结果）
+        min_contrast: 两类平均亮度的最小差值
+
+    Returns:
+        int: 分界t（亮度<=t为一类，>t为另一类）；对比度不足时返回None
+    """
+    hist = np.asarray(histogram, dtype=np.float64)[:256]
+    levels = np.arange(256, dtype=np.float64)
+    count_low = np.cumsum(hist)             # 亮度<=t的像素数
+    sum_low = np.cumsum(hist * levels)
+    total, total_sum = count_low[-1], sum_low[-1]
+    count_high = total - count_low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_low = sum_low / count_low
+        mean_high = (total_sum - sum_low) / count_high
+        between = count_low * count_high * (mean_high - mean_low) ** 2
+    between[~np.isfinite(between)] = 0
+    best = between.max()
+    if best == 0:
+        return None
+    # 两个峰之间没有像素时，一段分界的类间方差都相同（如纯黑底+纯白字），取这一段的中点
+    ties = np.flatnonzero(between >= best * (1 - 1e-9))
+    t = int(ties[0] + ties[-1]) // 2
+    if mean_high[t] - mean_low[t] < min_contrast:
+        return None
+    return t
+
+def text_threshold(is_dark_bg, histogram=None):
+    """文字阈值：深色背景亮度 > 阈值为文字，浅色背景亮度 < 阈值为文字
+
+    给出亮度直方图时按Otsu法自动选择，对比度不足时（以及不给直方图时）用固定的100/150。
+    """
+    if histogram is not None:
+        level = otsu_threshold(histogram)
+        if level is not None:
+            # 深色背景文字为 > level，浅色背景文字为 <= level
+            return level if is_dark_bg else level + 1
+    return 100 if is_dark_bg else 150
+
+def luminance_histogram(image, step=2):
+    """图片的256级亮度直方图（int64数组）
+
+    每隔step行、step列取样（最近邻缩小，只用来决定背景和阈值，取样足够），
+    Pillow在C里缩小、转换和统计（不持有GIL），多页可以在线程池中并行计算；同一首歌各页的直方图直接相加即可合并。
+    """
+    if step > 1 and image.width >= step and image.height >= step:
+        image = image.resize((image.width // step, image.height // step), Image.Resampling.NEAREST)
+    luminance = image if image.mode == 'L' else image.convert('L')
+    return np.array(luminance.histogram()[:256], dtype=np.int64)
+
+def histogram_levels(histogram, auto_threshold=False):
+    """由亮度直方图（一首歌所有页面合并后的）决定背景类型和阈值
+
+    背景：Otsu分界两侧像素多的一类（歌词图背景占大部分面积）；对比度不足时按平均亮度 < 80 判断。
+    不看画布中心或边缘，页面宽度不同时补的白边也不参与判断。
+
+    Returns:
+        (is_dark_bg, threshold)：可作为变色函数的levels参数，整首歌的各页使用同一判断
+    """
+    hist = np.asarray(histogram, dtype=np.float64)[:256]
+    level = otsu_threshold(hist)
+    if level is not None:
+        is_dark_bg = bool(hist[:level + 1].sum() >= hist[level + 1:].sum())
+    else:
+        total = hist.sum()
+        is_dark_bg = bool(total and (hist * np.arange(256)).sum() / total < 80)
+    return is_dark_bg, text_threshold(is_dark_bg, hist if auto_threshold else None)
+
+def apply_yellow_text_effect_fast(image, text_r=187, text_g=159, text_b=97, auto_threshold=False, levels=None):
+    """模式一：超高速变色效果 - 极致性能优化版本
+    
+    性能优化策略：
+    1. 使用整数运算替代浮点运算（3倍速提升）
+    2. 直接处理RGB，避免RGBA转换（减少25%内存）
+    3. 向量化赋值，一次性设置所有通道（2倍速提升）
+    4. 简化背景检测（减少50%计算）
+    
+    预期性能：2000x1500图片 < 50ms
+    适用场景：标准歌词图、批量处理、JPG格式
+
+    auto_threshold=True 时用亮度直方图（np.bincount隔行统计，一次O(N)）按Otsu法为每张图片选阈值，
+    褪色或偏暗的扫描件不会丢笔画；对比度太低时仍用固定阈值。
+    levels=(is_dark_bg, threshold) 时直接使用（同一首歌各页共用，见 histogram_levels），不再逐图检测。
+    """
+    try:
+        # 转换为RGB（比RGBA快，内存占用少25%）
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # 零拷贝：使用asarray而不是array
+        img_array = np.asarray(image)
+        
+        # 极速亮度计算：整数运算（比浮点快3倍）
+        # 使用位移运算代替除法：(77*R + 150*G + 29*B) >> 8 ≈ 0.299*R + 0.587*G + 0.114*B
+        luminance = fast_luminance(img_array)
+        
+        # 预分配结果数组（黑色背景）
+        result = np.zeros_like(img_array)
+        
+        if levels is not None:
+            is_dark_bg, threshold = levels
+        else:
+            # 快速背景检测：只检查中心区域（减少90%计算）
+            h, w = img_array.shape[:2]
+            center_y, center_x = h // 2, w // 2
+            sample_size = min(h, w) // 10
+            center_sample = luminance[
+                center_y - sample_size:center_y + sample_size,
+                center_x - sample_size:center_x + sample_size
+            ]
+            is_dark_bg = np.mean(center_sample) < 80
+
+            # 根据背景类型设置阈值（自动阈值时隔行统计直方图就足够：每行文字有几十个像素高）
+            histogram = np.bincount(luminance[::2].ravel(), minlength=256) if auto_threshold else None
+            threshold = text_threshold(is_dark_bg, histogram)
+        
+        # 创建文字掩码
+        is_text = (luminance > threshold) if is_dark_bg else (luminance < threshold)
+        
+        # 向量化赋值：一次性设置所有通道（比逐通道快2倍）
+        result[is_text] = [text_r, text_g, text_b]
+        
+        return Image.fromarray(result, 'RGB')
+        
+    except Exception as e:
+        print(f"应用变色效果失败: {e}")
+        return image
+
+def apply_yellow_text_effect_quality(image, text_r=187, text_g=159, text_b=97, keep_alpha=True, levels=None):
+    """模式二：高质量变色效果 - 精确算法版本（V1.4）
+    
+    特点：
+    1. 标准浮点运算，精度更高
+    2. 支持RGBA，完美保留透明通道
+    3. 四边检测，背景判断更准确
+    4. 逐通道处理，细节更丰富
+    
+    预期性能：2000x1500图片 约 150-200ms
+    适用场景：带透明PNG、复杂背景、边缘装饰图、高质量要求
+
+    keep_alpha=False 时直接返回RGB图片（输出JPEG时透明通道反正会被丢弃）：
+    结果的RGB与保留透明通道后再 convert('RGB') 完全相同，但省去了RGBA转换、
+    整图复制和保存前的 convert('RGB') 这几次整图拷贝。
+
+    levels=(is_dark_bg, threshold) 时只使用其中的背景类型（高质量模式的阈值固定为100/150）。
+    """
+    try:
+        # 检测背景类型
+        if levels is not None:
+            bg_type = 'dark' if levels[0] else 'light'
+        else:
+            bg_type = detect_background_type(image)
+
+        if not keep_alpha:
+            # RGBA直接取前三个通道的视图（不复制），其他模式转为RGB（RGB值与转RGBA时相同）
+            if image.mode == 'RGBA':
+                rgb_array = np.asarray(image)[..., :3]
+            else:
+                rgb_array = np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+
+            luminance = (
+                0.299 * rgb_array[..., 0] +
+                0.587 * rgb_array[..., 1] +
+                0.114 * rgb_array[..., 2]
+            )
+            # 深色背景改变亮色像素（文字），浅色背景改变暗色像素；其余像素为黑色
+            is_text = luminance > 100 if bg_type == 'dark' else luminance < 150
+            result = np.zeros(rgb_array.shape, dtype=np.uint8)
+            result[is_text] = [text_r, text_g, text_b]
+            return Image.fromarray(result, 'RGB')
+
+        # 转换为RGBA模式，便于处理透明度
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        img_array = np.array(image)
+
+        # 标准亮度计算方法（ITU-R BT.601）
+        luminance = (
+            0.299 * img_array[..., 0] +
+            0.587 * img_array[..., 1] +
+            0.114 * img_array[..., 2]
+        )
+
+        # 预分配结果数组
+        result = np.zeros_like(img_array)
+        result[..., 3] = 255  # 设置alpha通道
+
+        if bg_type == 'dark':
+            # 深色背景（黑底）：只改变亮色像素（文字）
+            is_text = luminance > 100
+            result[is_text, 0] = text_r  # R
+            result[is_text, 1] = text_g  # G
+            result[is_text, 2] = text_b  # B
+            result[is_text, 3] = img_array[is_text, 3]  # 保留原透明度
+
+            # 暗色像素（背景）保持黑色
+            result[~is_text, 0] = 0
+            result[~is_text, 1] = 0
+            result[~is_text, 2] = 0
+            result[~is_text, 3] = img_array[~is_text, 3]  # 保留原透明度
+        else:
+            # 浅色背景（白底）：改变暗色像素（文字）
+            is_text = luminance < 150
+            result[is_text, 0] = text_r  # R
+            result[is_text, 1] = text_g  # G
+            result[is_text, 2] = text_b  # B
+            result[is_text, 3] = img_array[is_text, 3]  # 保留原透明度
+
+            # 亮色像素（背景）变黑色
+            result[~is_text, 0] = 0
+            result[~is_text, 1] = 0
+            result[~is_text, 2] = 0
+            result[~is_text, 3] = img_array[~is_text, 3]  # 保留原透明度
+
+        # 保留原图透明区域
+        transparent_mask = img_array[..., 3] == 0
+        result[transparent_mask, 3] = 0
+
+        return Image.fromarray(result)
+
+    except Exception as e:
+        print(f"应用变色效果失败: {e}")
+        return image
+
+def text_weight_table(is_dark_bg, threshold, width=SMOOTH_RAMP_WIDTH):
+    """亮度 -> 文字权重（0-255）的256项查找表
+
+    threshold与快速模式含义相同（深色背景 > 阈值为文字，浅色背景 < 阈值为文字），
+    在二值分界处为中心做宽width的线性过渡：深色背景亮度越高权重越大，浅色背景相反。
+    width=1 时与快速模式的二值阈值完全相同。
+    """
+    center = threshold + 0.5 if is_dark_bg else threshold - 0.5
+    levels = np.arange(256, dtype=np.float32)
+    weight = np.clip((levels - center) / width + 0.5, 0, 1)
+    if not is_dark_bg:
+        weight = 1 - weight
+    return np.round(weight * 255).astype(np.uint8)
+
+def text_color_table(weight, text_r, text_g, text_b):
+    """文字权重表 -> RGB查找表（256x3）：权重255为文字颜色，0为黑色背景，中间按比例混合"""
+    color = np.array([text_r, text_g, text_b], dtype=np.uint32)
+    return ((weight.astype(np.uint32)[:, None] * color + 127) // 255).astype(np.uint8)
+
+def apply_yellow_text_effect_smooth(image, text_r=187, text_g=159, text_b=97, auto_threshold=False, levels=None):
+    """模式三：抗锯齿变色效果 - 查表版本
+
+    快速模式和高质量模式都是硬阈值，文字边缘的过渡像素要么变成文字颜色、要么变成黑色，
+    边缘呈锯齿状，JPEG也更难压缩。这里把亮度经过一张256项的过渡表映射到背景色和文字颜色之间：
+    1. Pillow在C里算亮度（convert('L')），不生成NumPy中间数组
+    2. 亮度图直接当作调色板图，调色板就是过渡表，convert('RGB')一次查表得到结果
+    3. 背景检测与快速模式相同（中心区域平均亮度）
+
+    预期性能：2000x1500图片 约 15ms（比快速模式还快）
+    适用场景：扫描件/缩放过的图片、文字边缘本身带灰度过渡的图片
+
+    auto_threshold=True 时过渡中心取亮度图直方图（Pillow在C里统计）的Otsu分界；
+    levels=(is_dark_bg, threshold) 的含义与快速模式相同。
+    """
+    try:
+        luminance = image if image.mode == 'L' else image.convert('L')
+
+        if levels is not None:
+            is_dark_bg, threshold = levels
+        else:
+            # 背景检测：与快速模式相同，只检查中心区域
+            w, h = luminance.size
+            sample_size = min(h, w) // 10
+            center = luminance.crop((w // 2 - sample_size, h // 2 - sample_size,
+                                     w // 2 + sample_size, h // 2 + sample_size))
+            is_dark_bg = np.mean(np.asarray(center)) < 80 if sample_size else False
+            threshold = text_threshold(is_dark_bg, luminance.histogram() if auto_threshold else None)
+        table = text_color_table(text_weight_table(is_dark_bg, threshold), text_r, text_g, text_b)
+
+        # 亮度值作为调色板索引：一次查表完成混合
+        indexed = Image.frombuffer('P', luminance.size, luminance.tobytes(), 'raw', 'P', 0, 1)
+        indexed.putpalette(table.tobytes())
+        return indexed.convert('RGB')
+
+    except Exception as e:
+        print(f"应用变色效果失败: {e}")
+        return image
+
+def apply_yellow_text_effect(image, text_r=187, text_g=159, text_b=97, use_quality_mode=False, auto_mode=False,
+                             keep_alpha=True, use_smooth_mode=False, auto_threshold=False, levels=None):
+    """智能变色效果 - 统一入口函数
+    
+    Args:
+        image: PIL.Image对象
+        text_r, text_g, text_b: 目标颜色的RGB值
+        use_quality_mode: True=高质量模式(V1.4), False=快速模式(V1.5默认)
+        auto_mode: True=智能模式（自动判断），优先级高于use_quality_mode
+        keep_alpha: False表示结果将保存为JPEG，高质量模式直接输出RGB，不经过RGBA
+        use_smooth_mode: True=抗锯齿模式（手动模式下use_quality_mode为False时生效）
+        auto_threshold: True=快速模式和抗锯齿模式按亮度直方图自动选阈值（高质量模式不受影响）
+        levels: 可选 (is_dark_bg, threshold)，由调用方统一决定背景类型和阈值（见 histogram_levels）
+    
+    Returns:
+        PIL.Image: 应用效果后的图片
+    """
+    engine = select_engine(image, use_quality_mode, auto_mode, use_smooth_mode)
+    if engine == 'quality':
+        return apply_yellow_text_effect_quality(image, text_r, text_g, text_b, keep_alpha, levels)
+    elif engine == 'smooth':
+        return apply_yellow_text_effect_smooth(image, text_r, text_g, text_b, auto_threshold, levels)
+    else:
+        return apply_yellow_text_effect_fast(image, text_r, text_g, text_b, auto_threshold, levels)
+
+def select_engine(image, use_quality_mode=False, auto_mode=False, use_smooth_mode=False):
+    """统一入口实际使用的引擎：'fast'、'quality' 或 'smooth'"""
+    # 智能模式：带透明通道用高质量模式，不带透明通道用快速模式
+    if auto_mode:
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        return 'quality' if has_alpha else 'fast'
+
+    # 手动模式
+    if use_quality_mode:
+        return 'quality'
+    return 'smooth' if use_smooth_mode else 'fast'
+
+def fast_luminance(image):
+    """快速模式的整数亮度（uint16数组）：(77*R + 150*G + 29*B) >> 8
+
+    image可以是PIL.Image，也可以是已经取出的RGB数组（HxWx3，不再转换和复制）
+    """
+    if isinstance(image, np.ndarray):
+        img_array = image
+    else:
+        img_array = np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+    return (
+        img_array[..., 0].astype(np.uint16) * 77 +
+        img_array[..., 1].astype(np.uint16) * 150 +
+        img_array[..., 2].astype(np.uint16) * 29
+    ) >> 8
+
+def band_boxes(size, bands):
+    """按行把图片切成最多bands块，返回各块的裁剪框
+
+    每块的起始行都是偶数：快速模式隔行统计直方图时，各块统计结果相加与整图相同。
+    """
+    width, height = size
+    bands = max(1, min(bands, height // MIN_BAND_ROWS))
+    rows = -(-height // bands)
+    rows += rows % 2
+    return [(0, top, width, min(top + rows, height)) for top in range(0, height, rows)]
+
+def image_levels(image, engine, auto_threshold=False, boxes=None, map_bands=map):
+    """整张图片的 (is_dark_bg, threshold)，与引擎逐图检测的结果完全相同
+
+    背景只看中心区域（快速/抗锯齿模式）或四边（高质量模式），不转换整张图片；
+    自动阈值需要的直方图按 boxes 分块统计后相加，map_bands 传入线程池的map时并行统计。
+    """
+    if engine == 'quality':
+        return detect_background_type(image) == 'dark', None
+
+    w, h = image.size
+    boxes = boxes or [(0, 0, w, h)]
+    sample_size = min(h, w) // 10
+    center = image.crop((w // 2 - sample_size, h // 2 - sample_size,
+                         w // 2 + sample_size, h // 2 + sample_size))
+    if engine == 'smooth':
+        center = center if center.mode == 'L' else center.convert('L')
+        is_dark_bg = bool(sample_size) and np.mean(np.asarray(center)) < 80
+
+        def band_histogram(box):
+            band = image.crop(box)
+            return np.array((band if band.mode == 'L' else band.convert('L')).histogram()[:256], dtype=np.int64)
+    else:
+        is_dark_bg = bool(sample_size) and np.mean(fast_luminance(center)) < 80
+
+        def band_histogram(box):
+            return np.bincount(fast_luminance(image.crop(box))[::2].ravel(), minlength=256)
+
+    histogram = sum(map_bands(band_histogram, boxes)) if auto_threshold else None
+    return is_dark_bg, text_threshold(is_dark_bg, histogram)
+
+def apply_yellow_text_effect_bands(image, text_r=187, text_g=159, text_b=97, use_quality_mode=False, auto_mode=False,
+                                   use_smooth_mode=False, auto_threshold=False, levels=None, map_bands=map, bands=4):
+    """分块变色：按行切成几块分别变色再拼回，结果与 apply_yellow_text_effect(keep_alpha=False) 完全相同
+
+    先由整张图片统一决定背景类型和阈值（image_levels），各块再用同一levels逐像素变色。
+    map_bands 传入线程池的map即可并行：NumPy和Pillow的逐像素运算不持有GIL，一张超大图片也能用满多核。
+    """
+    engine = select_engine(image, use_quality_mode, auto_mode, use_smooth_mode)
+    image.load()  # 先解码，各线程只做裁剪
+    boxes = band_boxes(image.size, bands)
+    if levels is None:
+        levels = image_levels(image, engine, auto_threshold, boxes, map_bands)
+
+    def recolor_band(box):
+        band = image.crop(box)
+        if engine == 'quality':
+            return apply_yellow_text_effect_quality(band, text_r, text_g, text_b, False, levels)
+        elif engine == 'smooth':
+            return apply_yellow_text_effect_smooth(band, text_r, text_g, text_b, levels=levels)
+        else:
+            return apply_yellow_text_effect_fast(band, text_r, text_g, text_b, levels=levels)
+
+    result = Image.new('RGB', image.size)
+    for box, band in zip(boxes, map_bands(recolor_band, boxes)):
+        result.paste(band, box[:2])
+    return result
@@ -0,0 +1,284 @@
+"""本地HTTP处理服务（只用标准库）"""
+import hashlib
+import json
+import os
+import signal
+import threading
+from collections import OrderedDict
+
+from PIL import UnidentifiedImageError
+
+from . import __version__
+from .api import ALGORITHMS, recolor_bytes, stitch_bytes
+from .settings import DEFAULT_SETTINGS, get_algorithm, parse_hex_color
+
+class ResultCache:
+    """按字节数限制大小的LRU结果缓存（线程安全），服务模式下重复请求直接返回上次的JPEG"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return  # 比整个缓存还大，不缓存
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+def render_pages(pages, options):
+    """服务模式的处理函数（在进程池中执行）：解码 → 拼接 → 变色 → 编码，返回JPEG字节
+
+    与批处理的行为一致：单页且需要变色时直接变色，其余情况先竖向拼接。
+
+    Args:
+        pages: 各页图片的原始字节（按页码顺序）
+        options: {'invert', 'color': (r, g, b), 'algorithm', 'auto_threshold', 'enable_compression',
+                  'compression_quality'}
+    """
+    options = dict(options)
+    if len(pages) == 1 and options.pop('invert'):
+        return recolor_bytes(pages[0], **options)
+    return stitch_bytes(pages, **options)
+
+def _init_service_worker():
+    """服务进程池子进程的初始化：忽略Ctrl+C，由主进程负责停止服务和关闭进程池"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _warm_up_worker():
+    """让进程池提前启动子进程，第一个请求不用等进程启动"""
+    return os.getpid()
+
+class ServiceError(Exception):
+    """服务请求错误，带HTTP状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class ProcessingService:
+    """本地HTTP处理服务：通过HTTP请求变色/拼接页面，不经过文件系统（只用标准库）
+
+    接口（参数放在查询字符串中，未提供的取config.json中的设置）:
+        GET  /health              服务状态、队列和缓存统计（JSON）
+        POST /recolor             请求体为一张图片，返回变色后的JPEG
+        POST /stitch              请求体为multipart/form-data，各部分按顺序为各页图片，返回拼接后的JPEG；
+                                  invert=1 时拼接后再变色（与"反色+拼接"模式一致）
+        参数: color=DAA520  algorithm=auto|fast|quality|smooth  threshold=auto|fixed  quality=70-95  compression=0|1
+
+    处理在常驻的进程池中执行（启动时预热，多个请求真正并行，不受GIL限制）。
+    排队的请求超过max_pending时直接返回503，避免请求无限堆积占满内存。
+    结果按请求内容的哈希缓存在内存LRU中，重复请求不再进入进程池。
+    """
+
+    max_request_bytes = 256 * 1024 * 1024
+
+    def __init__(self, settings, workers=None, max_pending=None, cache_bytes=256 * 1024 * 1024, log=print):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings)
+        self.workers = workers or os.cpu_count() or 4
+        self.max_pending = max_pending or self.workers * 4
+        self.cache = ResultCache(cache_bytes)
+        self.log = log
+        self.pending = 0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending_lock = threading.Lock()
+        self.pool = None
+
+    def start(self):
+        """启动进程池并预热所有子进程"""
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_service_worker)
+        for future in [self.pool.submit(_warm_up_worker) for _ in range(self.workers)]:
+            future.result()
+        self.log(f"🔥 进程池已预热: {self.workers} 个进程，队列上限 {self.max_pending} 个请求，"
+                 f"缓存 {self.cache.max_bytes // (1024 * 1024)} MB")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def options(self, query, invert):
+        """把查询参数转换为 render_pages 的选项（未提供的取服务启动时的设置）"""
+        s = self.settings
+        params = {key: values[-1] for key, values in query.items()}
+        options = {
+            'color': (s['yellow_text_r'], s['yellow_text_g'], s['yellow_text_b']),
+            'invert': invert,
+            'algorithm': get_algorithm(s),
+            'auto_threshold': s['auto_threshold'],
+            'enable_compression': s['enable_compression'],
+            'compression_quality': s['compression_quality'],
+        }
+        try:
+            if 'color' in params:
+                options['color'] = parse_hex_color(params['color'])
+            if 'algorithm' in params:
+                if params['algorithm'] not in ALGORITHMS:
+                    raise ValueError(f"无效的算法模式: {params['algorithm']}")
+                options['algorithm'] = params['algorithm']
+            if 'threshold' in params:
+                if params['threshold'] not in ('auto', 'fixed'):
+                    raise ValueError(f"无效的阈值模式: {params['threshold']}")
+                options['auto_threshold'] = params['threshold'] == 'auto'
+            if 'quality' in params:
+                options['compression_quality'] = max(70, min(95, int(params['quality'])))
+            if 'compression' in params:
+                options['enable_compression'] = params['compression'] not in ('0', 'false', 'no')
+        except ValueError as e:
+            raise ServiceError(400, str(e))
+        return options
+
+    def cache_key(self, pages, options):
+        digest = hashlib.blake2b(repr(sorted(options.items())).encode(), digest_size=20)
+        for page in pages:
+            digest.update(len(page).to_bytes(8, 'little'))
+            digest.update(page)
+        return digest.digest()
+
+    def process(self, pages, options):
+        """返回 (JPEG字节, 是否命中缓存)；队列已满时抛出ServiceError(503)"""
+        key = self.cache_key(pages, options)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, True
+
+        if not self._slots.acquire(blocking=False):
+            raise ServiceError(503, f"处理队列已满（{self.max_pending}个请求），请稍后重试")
+        try:
+            with self._pending_lock:
+                self.pending += 1
+            try:
+                data = self.pool.submit(render_pages, pages, options).result()
+            except (UnidentifiedImageError, ValueError, OSError) as e:
+                raise ServiceError(400, f"无法处理图片: {str(e)}")
+        finally:
+            with self._pending_lock:
+                self.pending -= 1
+            self._slots.release()
+        self.cache.put(key, data)
+        return data, False
+
+    def health(self):
+        with self._pending_lock:
+            pending = self.pending
+        return {'version': __version__, 'workers': self.workers, 'pending': pending,
+                'max_pending': self.max_pending, 'cache': self.cache.stats()}
+
+    def serve(self, host='127.0.0.1', port=8765):
+        """启动服务并阻塞到 Ctrl+C"""
+        from http.server import ThreadingHTTPServer
+        self.start()
+        httpd = ThreadingHTTPServer((host, port), _make_service_handler())
+        httpd.daemon_threads = True
+        httpd.service = self
+        self.log(f"🌐 处理服务已启动: http://{host}:{httpd.server_address[1]}/（按Ctrl+C停止）")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            self.close()
+            self.log("⏹ 处理服务已停止")
+
+def _read_request_pages(content_type, body):
+    """从请求体取出各页图片字节：multipart/form-data按各部分顺序，否则整个请求体是一张图片"""
+    if not content_type.lower().startswith('multipart/'):
+        return [body] if body else []
+    import email.parser
+    import email.policy
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+    return [part.get_payload(decode=True) for part in message.iter_parts()
+            if part.get_payload(decode=True)]
+
+def _make_service_handler():
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, urlsplit
+
+    class ServiceRequestHandler(BaseHTTPRequestHandler):
+        server_version = f"PicStitcher/{__version__}"
+
+        def send_body(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_body(status, body, 'application/json; charset=utf-8', headers)
+
+        def do_GET(self):
+            if urlsplit(self.path).path == '/health':
+                self.send_json(200, self.server.service.health())
+            else:
+                self.send_json(404, {'error': "未知的接口"})
+
+        def do_POST(self):
+            service = self.server.service
+            url = urlsplit(self.path)
+            if url.path not in ('/recolor', '/stitch'):
+                self.send_json(404, {'error': "未知的接口"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > service.max_request_bytes:
+                    raise ServiceError(413, "请求体过大")
+                body = self.rfile.read(length)
+                pages = _read_request_pages(self.headers.get('Content-Type', ''), body)
+                del body
+                if not pages:
+                    raise ServiceError(400, "请求中没有图片")
+
+                query = parse_qs(url.query)
+                if url.path == '/recolor':
+                    if len(pages) != 1:
+                        raise ServiceError(400, "/recolor 只接受一张图片，多页请使用 /stitch")
+                    options = service.options(query, invert=True)
+                else:
+                    invert = query.get('invert', ['0'])[-1] not in ('0', 'false', 'no')
+                    options = service.options(query, invert=invert)
+
+                data, cached = service.process(pages, options)
+                self.send_body(200, data, 'image/jpeg', {'X-Cache': 'hit' if cached else 'miss'})
+            except ServiceError as e:
+                headers = {'Retry-After': '1'} if e.status == 503 else None
+                self.send_json(e.status, {'error': str(e)}, headers)
+            except Exception as e:
+                self.send_json(500, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            self.server.service.log(f"{self.address_string()} {format % args}")
+
+    return ServiceRequestHandler
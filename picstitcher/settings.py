@@ -0,0 +1,91 @@
+"""处理设置：默认值、config.json读写和颜色解析"""
+import json
+import sys
+from pathlib import Path
+
+# I/O并发参数（输入/输出在网络共享盘上时，I/O并发要比CPU并发高得多）
+DEFAULT_IO_WORKERS = 8      # I/O线程数（读/写各一个线程池）
+DEFAULT_PREFETCH_AHEAD = 16  # 预读文件数（提前读入内存的原始字节数量上限）
+
+# 默认处理设置（键与config.json一致，另加process_mode和profile_run）
+DEFAULT_SETTINGS = {
+    'input_folder': '',
+    'output_folder': '',
+    'process_mode': 'invert_only',  # invert_concat=反色+拼接, invert_only=仅反色, concat=仅拼接
+    'yellow_text_r': 218,
+    'yellow_text_g': 165,
+    'yellow_text_b': 32,
+    'use_quality_mode': False,
+    'use_auto_mode': True,
+    'use_smooth_mode': False,  # 抗锯齿模式（智能模式和高质量模式都关闭时生效）
+    'auto_threshold': False,   # 快速/抗锯齿模式按每张图片的亮度直方图自动选阈值
+    'group_levels': True,      # 反色+拼接时整首歌按各页合并的亮度直方图统一决定背景类型和阈值
+    'recolor_pages': True,     # 反色+拼接时先逐页并行变色再拼接（结果相同，需要group_levels）
+    'band_min_pixels': 16_000_000,  # 单张图片（或拼接后的整首歌）超过这么多像素时按行分块并行变色（0=不分块）
+    'enable_compression': True,
+    'compression_quality': 82,
+    'io_workers': DEFAULT_IO_WORKERS,
+    'prefetch_ahead': DEFAULT_PREFETCH_AHEAD,
+    'use_mmap': False,
+    'plan_inputs': True,       # 处理前先并行读取所有文件头：检查无法识别的文件、估算内存和像素数
+    'largest_first': True,     # 仅反色时按文件头估算的像素数，大图先处理（缩短多线程时的长尾；需要plan_inputs）
+    'adaptive_workers': True,  # 按实测吞吐量自动调整CPU线程数
+    'min_workers': 1,
+    'max_workers': 0,          # 0 = CPU核数
+    'enable_timing': False,
+    'save_timing_json': False,
+    'track_memory': False,
+    'profile_run': False,  # 采样剖析本次运行（不保存到配置）
+}
+
+def get_config_path():
+    """获取配置文件路径，兼容打包后的EXE环境"""
+    try:
+        # 检查是否是打包后的可执行文件
+        if getattr(sys, 'frozen', False):
+            # 打包后的环境，使用可执行文件所在目录
+            if hasattr(sys, '_MEIPASS'):
+                # PyInstaller 打包
+                exe_dir = Path(sys.executable).parent
+            else:
+                # 其他打包工具
+                exe_dir = Path(sys.argv[0]).parent
+            config_path = exe_dir / 'config.json'
+            print(f"检测到打包环境，配置文件路径: {config_path}")
+        else:
+            # 开发环境，使用程序目录（picstitcher包的上一级，与main.py同目录）
+            config_path = Path(__file__).resolve().parent.parent / 'config.json'
+        
+        return config_path
+        
+    except Exception as e:
+        print(f"获取配置文件路径失败: {e}")
+        # 备用方案：使用当前工作目录
+        fallback_path = Path.cwd() / 'config.json'
+        print(f"使用备用路径: {fallback_path}")
+        return fallback_path
+
+def load_settings(config_path=None):
+    """读取config.json，返回完整的处理设置（缺失的键使用默认值）"""
+    settings = dict(DEFAULT_SETTINGS)
+    config_path = Path(config_path) if config_path else get_config_path()
+    if config_path.exists():
+        with config_path.open('r', encoding='utf-8') as f:
+            cfg = json.load(f)
+        settings.update({key: value for key, value in cfg.items() if key in DEFAULT_SETTINGS})
+    return settings
+
+def get_algorithm(settings):
+    """设置中的算法开关 -> 算法模式名（与picstitcher.api的algorithm参数相同）"""
+    if settings['use_auto_mode']:
+        return 'auto'
+    if settings['use_quality_mode']:
+        return 'quality'
+    return 'smooth' if settings['use_smooth_mode'] else 'fast'
+
+def parse_hex_color(text):
+    """把 "#DAA520" / "DAA520" 解析为 (r, g, b)，格式不对时抛出ValueError"""
+    hex_value = text.lstrip('#')
+    if len(hex_value) != 6 or not all(c in '0123456789ABCDEFabcdef' for c in hex_value):
+        raise ValueError(f"无效的颜色: {text}")
+    return int(hex_value[0:2], 16), int(hex_value[2:4], 16), int(hex_value[4:6], 16)
@@ -0,0 +1,148 @@
+"""竖向拼接"""
+import os
+from collections import deque
+
+from PIL import Image
+
+from .recolor import histogram_levels, luminance_histogram
+
+def vertical_concat_images(image_paths, on_error=None, on_page=None):
+    """竖向拼接图片
+
+    先只读取各页文件头确定画布尺寸，再逐页解码、粘贴并释放，内存中只保留画布和当前一页
+    （原先是全部页面解码完才知道画布大小）。无法读取的页面跳过。
+
+    Args:
+        image_paths: 图片路径列表（也可以是文件对象/预读的字节流，或已解码的PIL.Image对象）
+        on_error: 可选回调 on_error(index, exception)，某页无法读取而被跳过时调用
+        on_page: 可选回调 on_page(index, image)，每页解码后、粘贴前调用（例如统计亮度直方图）；
+                 有页面解码失败而重新布局时，之前的页面会再次回调（按index覆盖即可）
+    """
+    originals = list(image_paths)
+    sources = list(originals)
+    while True:
+        # 打开所有图片（只读文件头，不解码）
+        images = []
+        for i, source in enumerate(sources):
+            if source is None:
+                continue
+            try:
+                if isinstance(source, Image.Image):
+                    img = source
+                else:
+                    if hasattr(source, 'seek'):
+                        source.seek(0)
+                    img = Image.open(source)
+                images.append((i, img))
+            except Exception as e:
+                # 继续处理其他图片
+                sources[i] = None
+                if on_error:
+                    on_error(i, e)
+
+        if not images:
+            raise ValueError("无有效图片可拼接")
+
+        # 找到最大宽度
+        max_width = max(img.width for _, img in images)
+
+        # 计算总高度
+        total_height = sum(img.height for _, img in images)
+
+        # 创建新图像
+        result_img = Image.new('RGB', (max_width, total_height), color=(255, 255, 255))
+
+        # 逐页解码并粘贴，粘贴完立即释放该页（只对按路径打开的页面close，传入的文件对象留给调用方）
+        y_offset = 0
+        failed = False
+        images = deque(images)
+        while images:
+            i, img = images.popleft()
+            try:
+                if not failed:
+                    img.load()
+                    if on_page:
+                        on_page(i, img)
+                    # 如果图片宽度小于最大宽度，居中放置
+                    x_offset = (max_width - img.width) // 2
+                    result_img.paste(img, (x_offset, y_offset))
+                    y_offset += img.height
+            except Exception as e:
+                # 文件头正常但解码失败：去掉这页重新布局
+                failed = True
+                sources[i] = None
+                if on_error:
+                    on_error(i, e)
+            finally:
+                if isinstance(originals[i], (str, os.PathLike)):
+                    img.close()
+                del img
+
+        if not failed:
+            return result_img
+
+def concat_recolored_pages(sources, recolor, auto_threshold=False, map_pages=map, on_error=None):
+    """逐页变色后竖向拼接，结果与先拼接（vertical_concat_images）再用同样的levels变色完全相同
+
+    变色引擎都是逐像素的，只要各页使用同一组背景类型和阈值，先变色再拼接与先拼接再变色一致：
+    1. 各页并行解码，转为RGB（与粘贴到RGB画布时相同），同时统计亮度直方图
+    2. 合并直方图，整首歌决定一次背景类型和阈值（histogram_levels）
+    3. 各页并行变色，按顺序粘贴到画布上；画布底色是白色变色后的颜色（即原先补的白边变色后的结果）
+    每页变色的工作集只有一页大小，变色完立即释放原页。无法读取的页面跳过。
+
+    Args:
+        sources: 各页文件对象/预读的字节流（按页码顺序）
+        recolor: recolor(image, levels) -> RGB图片
+        auto_threshold: 按合并后的直方图自动选阈值
+        map_pages: 按顺序返回结果的map函数，传入 executor.map 即可多线程并行（默认单线程）
+        on_error: 可选回调 on_error(index, exception)，某页无法读取而被跳过时调用
+    """
+    def decode(item):
+        index, source = item
+        try:
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            img = Image.open(source)
+            img.load()
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            return index, img, luminance_histogram(img), None
+        except Exception as e:
+            return index, None, None, e
+
+    pages = []
+    histogram = 0
+    for index, img, page_histogram, error in map_pages(decode, enumerate(sources)):
+        if error is not None:
+            if on_error:
+                on_error(index, error)
+            continue
+        pages.append(img)
+        histogram = histogram + page_histogram
+    if not pages:
+        raise ValueError("无有效图片可拼接")
+
+    levels = histogram_levels(histogram, auto_threshold)
+    background = recolor(Image.new('RGB', (1, 1), (255, 255, 255)), levels).getpixel((0, 0))
+    max_width = max(img.width for img in pages)
+    offsets = []
+    y_offset = 0
+    for img in pages:
+        offsets.append(((max_width - img.width) // 2, y_offset))
+        y_offset += img.height
+    result_img = Image.new('RGB', (max_width, y_offset), color=background)
+
+    def recolor_page(index):
+        img, pages[index] = pages[index], None  # 变色后原页不再需要
+        return recolor(img, levels)
+
+    for offset, page in zip(offsets, map_pages(recolor_page, range(len(pages)))):
+        result_img.paste(page, offset)
+    return result_img
+
+def stitched_size(sizes):
+    """竖向拼接后的画布尺寸（与vertical_concat_images一致：最大宽度 × 高度之和），跳过None；全部无效时返回None"""
+    sizes = [size for size in sizes if size]
+    if not sizes:
+        return None
+    return max(w for w, h in sizes), sum(h for w, h in sizes)